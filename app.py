@@ -1,11 +1,138 @@
+import bisect
+import time
 import tkinter as tk
+from contextlib import redirect_stdout
+from io import StringIO
 from tkinter import scrolledtext
-from main import run_source_code  # ahora importa correctamente
+from main import build_source_code  # ahora importa correctamente
+from cpu_core import cargar_programa
+
+# Durante la ejecucion: tiempo de CPU por turno del bucle de Tk y
+# periodo minimo entre refrescos del inspector (ms)
+TURNO_MS = 30
+REFRESCO_MS = 150
+
+
+class RangosVirtuales:
+    """
+    Secuencia de claves definida por rangos (inicio, fin) inclusivos sin
+    expandirlos: la fila i se resuelve con una busqueda binaria, de modo que
+    un rango de millones de direcciones no ocupa memoria.
+    """
+
+    def __init__(self, rangos):
+        self.rangos = list(rangos)
+        self.acumulado = []
+        total = 0
+        for ini, fin in self.rangos:
+            total += fin - ini + 1
+            self.acumulado.append(total)
+
+    def __len__(self):
+        return self.acumulado[-1] if self.acumulado else 0
+
+    def __getitem__(self, i):
+        k = bisect.bisect_right(self.acumulado, i)
+        previo = self.acumulado[k - 1] if k else 0
+        return self.rangos[k][0] + (i - previo)
+
+
+class TablaVirtual(tk.Frame):
+    """
+    Tabla (clave, valor) que solo dibuja las filas visibles. Los valores se
+    leen al refrescar y se resaltan los que cambiaron desde el refresco
+    anterior.
+    """
+    ALTO_FILA = 18
+    COLOR_CAMBIO = "#fff2a8"
+
+    def __init__(self, master, titulo, formato_clave, filas=12, ancho=300):
+        super().__init__(master)
+        tk.Label(self, text=titulo).pack(anchor="w")
+        cuerpo = tk.Frame(self)
+        cuerpo.pack(fill="both", expand=True)
+        self.canvas = tk.Canvas(cuerpo, width=ancho, height=filas * self.ALTO_FILA,
+                                bg="white", highlightthickness=0)
+        self.barra = tk.Scrollbar(cuerpo, orient="vertical", command=self._yview)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.barra.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", lambda e: self._dibujar())
+        self.canvas.bind("<MouseWheel>", lambda e: self._ir_a(self.primera + (-3 if e.delta > 0 else 3)))
+        self.canvas.bind("<Button-4>", lambda e: self._ir_a(self.primera - 3))
+        self.canvas.bind("<Button-5>", lambda e: self._ir_a(self.primera + 3))
+
+        self.formato_clave = formato_clave
+        self.claves = RangosVirtuales([])
+        self.leer = lambda clave: 0
+        self.primera = 0
+        self.valores = {}      # valores mostrados de las filas visibles
+        self.cambiadas = set()
+
+    def configurar(self, claves, leer):
+        self.claves, self.leer = claves, leer
+        self.primera = 0
+        self.valores = {}
+        self.cambiadas = set()
+        self._dibujar()
+
+    def _filas_pantalla(self):
+        return max(self.canvas.winfo_height() // self.ALTO_FILA, 1)
+
+    def _visibles(self):
+        return range(self.primera, min(self.primera + self._filas_pantalla(), len(self.claves)))
+
+    def refrescar(self):
+        """Vuelve a leer las filas visibles y marca las que cambiaron."""
+        anteriores = self.valores
+        self.valores = {}
+        self.cambiadas = set()
+        for i in self._visibles():
+            clave = self.claves[i]
+            valor = self.leer(clave)
+            if clave in anteriores and anteriores[clave] != valor:
+                self.cambiadas.add(clave)
+            self.valores[clave] = valor
+        self._dibujar()
+
+    def _dibujar(self):
+        c = self.canvas
+        c.delete("all")
+        ancho = c.winfo_width()
+        visibles = self._visibles()
+        for fila, i in enumerate(visibles):
+            clave = self.claves[i]
+            if clave not in self.valores:
+                # Fila que acaba de entrar en pantalla al desplazarse
+                self.valores[clave] = self.leer(clave)
+            y = fila * self.ALTO_FILA
+            if clave in self.cambiadas:
+                c.create_rectangle(0, y, ancho, y + self.ALTO_FILA, fill=self.COLOR_CAMBIO, outline="")
+            c.create_text(4, y + 2, anchor="nw", font="TkFixedFont", text=self.formato_clave(clave))
+            c.create_text(110, y + 2, anchor="nw", font="TkFixedFont", text=str(self.valores[clave]))
+        total = len(self.claves)
+        if total:
+            self.barra.set(self.primera / total, (self.primera + len(visibles)) / total)
+        else:
+            self.barra.set(0, 1)
+
+    def _yview(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            self._ir_a(int(float(cantidad) * len(self.claves)))
+        elif accion == "scroll":
+            paso = self._filas_pantalla() if unidad == "pages" else 1
+            self._ir_a(self.primera + int(cantidad) * paso)
+
+    def _ir_a(self, fila):
+        self.primera = max(0, min(fila, len(self.claves) - self._filas_pantalla()))
+        self._dibujar()
+
 
 class SimulatorGUI:
     def __init__(self, root):
         self.root = root
         root.title("Simulador de CPU con Compilador")
+        self.cpu = None
+        self.detener = False
 
         # Configuracin superior
         config_frame = tk.Frame(root)
@@ -25,9 +152,11 @@ class SimulatorGUI:
         self.instr_text = scrolledtext.ScrolledText(root, width=90, height=15)
         self.instr_text.pack(padx=10, pady=5)
 
-        # Botn ejecutar
-        run_btn = tk.Button(root, text="Compilar y Ejecutar", command=self.run)
-        run_btn.pack(pady=5)
+        # Botones ejecutar / detener
+        botones = tk.Frame(root)
+        botones.pack(pady=5)
+        tk.Button(botones, text="Compilar y Ejecutar", command=self.run).pack(side="left", padx=5)
+        tk.Button(botones, text="Detener", command=self.stop).pack(side="left", padx=5)
 
         # rea de salida
         output_label = tk.Label(root, text="Salida:")
@@ -35,57 +164,126 @@ class SimulatorGUI:
         self.output_text = scrolledtext.ScrolledText(root, width=90, height=12, state="disabled")
         self.output_text.pack(padx=10, pady=5)
 
-    def parse_list(self, text, is_mem=False):
-        items = []
+        # Inspector de registros y memoria (se refresca durante la ejecucion)
+        inspector = tk.Frame(root)
+        inspector.pack(padx=10, pady=5, fill="x")
+        self.tabla_reg = TablaVirtual(inspector, "Registros", lambda r: f"R{r}", filas=8)
+        self.tabla_reg.pack(side="left", fill="both", expand=True, padx=(0, 5))
+        self.tabla_mem = TablaVirtual(inspector, "Memoria", lambda d: f"0x{d:08X}", filas=8)
+        self.tabla_mem.pack(side="left", fill="both", expand=True)
+        self.estado = tk.Label(root, text="", anchor="w")
+        self.estado.pack(fill="x", padx=10, pady=(0, 5))
+
+    def parse_ranges(self, text, is_mem=False):
+        """Rangos (inicio, fin) inclusivos de una consulta como '0-3,8' o '0x100-0x1FF'."""
+        ranges = []
         text = text.replace(' ', '')
         if not text:
-            return items
+            return ranges
         for part in text.split(','):
-            if '-' in part:
-                start_str, end_str = part.split('-', 1)
-                try:
+            try:
+                if '-' in part:
+                    start_str, end_str = part.split('-', 1)
                     start = int(start_str, 0) if is_mem else int(start_str)
                     end = int(end_str, 0) if is_mem else int(end_str)
-                    for v in range(start, end + 1):
-                        items.append(v)
-                except ValueError:
-                    continue
-            else:
-                try:
-                    items.append(int(part, 0) if is_mem else int(part))
-                except ValueError:
-                    continue
-        return items
+                else:
+                    start = end = int(part, 0) if is_mem else int(part)
+            except ValueError:
+                continue
+            if start <= end:
+                ranges.append((start, end))
+        return ranges
+
+    def _escribir(self, texto):
+        if not texto:
+            return
+        self.output_text.configure(state="normal")
+        self.output_text.insert(tk.END, texto)
+        self.output_text.see(tk.END)
+        self.output_text.configure(state="disabled")
 
     def run(self):
+        if self.cpu is not None and self.cpu.running:
+            return  # ya hay una ejecucion en curso
         self.output_text.configure(state="normal")
         self.output_text.delete("1.0", tk.END)
+        self.output_text.configure(state="disabled")
 
-        reg_q = self.reg_entry.get()
-        mem_q = self.mem_entry.get()
+        # Registros fuera de 0-15 se recortan; sin consulta se muestran todos
+        reg_q = [(max(a, 0), min(b, 15)) for a, b in self.parse_ranges(self.reg_entry.get())
+                 if a <= 15 and b >= 0] or [(0, 15)]
+        mem_q = self.parse_ranges(self.mem_entry.get(), is_mem=True)
         raw_lines = self.instr_text.get("1.0", tk.END).strip().splitlines()
         source_code = "\n".join(raw_lines)
 
+        buf = StringIO()
         try:
-            # Ejecutar compilador y simulador
-            from io import StringIO
-            import sys
-
-            # Redirigir stdout para capturar la salida
-            old_stdout = sys.stdout
-            sys.stdout = mystdout = StringIO()
+            with redirect_stdout(buf):
+                programa = build_source_code(source_code)
+                if programa is not None:
+                    print("\n Paso 3: Ejecutando en CPU simulada...")
+                    bin_lines, data = programa
+                    self.cpu = cargar_programa(bin_lines, datos=data)
+        except Exception as e:
+            buf.write(f" Error: {e}\n")
+            programa = None
+        self._escribir(buf.getvalue())
+        if programa is None:
+            return
 
-            run_source_code(source_code)
+        cpu = self.cpu
+        self.tabla_reg.configurar(RangosVirtuales(reg_q), lambda r: cpu.reg[r])
+        # Lectura directa de los datos: no dispara E/S mapeada ni watchpoints
+        self.tabla_mem.configurar(RangosVirtuales(mem_q), lambda d: cpu.mem.data.get(d, 0))
+        self.detener = False
+        self.pasos = 0
+        self.inicio = self.ultimo_refresco = time.perf_counter()
+        self.root.after(0, self._turno)
 
-            # Restaurar stdout
-            sys.stdout = old_stdout
-            output = mystdout.getvalue()
-            self.output_text.insert(tk.END, output)
+    def stop(self):
+        self.detener = True
 
+    def _turno(self):
+        """Ejecuta durante TURNO_MS y devuelve el control a Tk."""
+        cpu = self.cpu
+        fin = time.perf_counter() + TURNO_MS / 1000
+        buf = StringIO()
+        try:
+            with redirect_stdout(buf):
+                while cpu.running and not self.detener and time.perf_counter() < fin:
+                    self.pasos += cpu.step(2000)
         except Exception as e:
-            self.output_text.insert(tk.END, f" Error: {e}\n")
+            buf.write(f" Error durante ejecucin: {e}\n")
+            cpu.running = False
+        self._escribir(buf.getvalue())
 
-        self.output_text.configure(state="disabled")
+        terminado = not cpu.running or self.detener
+        ahora = time.perf_counter()
+        if terminado or (ahora - self.ultimo_refresco) * 1000 >= REFRESCO_MS:
+            self.tabla_reg.refrescar()
+            self.tabla_mem.refrescar()
+            self.estado.configure(text=f"Instrucciones: {self.pasos}  PC: {cpu.PC}  "
+                                       f"({ahora - self.inicio:.2f} s)")
+            self.ultimo_refresco = ahora
+        if terminado:
+            self._finalizar()
+        else:
+            self.root.after(1, self._turno)
+
+    def _finalizar(self):
+        cpu = self.cpu
+        buf = StringIO()
+        with redirect_stdout(buf):
+            cpu.io.flush()
+            print("\n Estado final de los registros:")
+            for i, val in enumerate(cpu.reg):
+                print(f"   R{i}: {val}")
+            if cpu.running:
+                cpu.running = False
+                print("\n Ejecucin detenida por el usuario.")
+            else:
+                print("\n Programa finalizado correctamente.")
+        self._escribir(buf.getvalue())
 
 if __name__ == '__main__':
     root = tk.Tk()
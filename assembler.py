@@ -3,9 +3,12 @@
 Simple Assembler for the Simulated CPU
 """
 
+import os
 import sys
 import re
 
+from instrucciones import CODIF_VARIABLE, CODIF_FIJA64, MAGIC_FIJA64, MASK46
+
 # Instruction metadata
 INSTR = {
     'NOP':   {'code': 0x00, 'mode': None, 'imm_bits': 0},
@@ -39,10 +42,72 @@ INSTR = {
     'RET':   {'code': 0xD9, 'mode': None, 'imm_bits': 0},
     'PUSH':  {'code': 0xD0, 'mode': 0,    'imm_bits': 0},
     'POP':   {'code': 0xD1, 'mode': 0,    'imm_bits': 0},
-    'INT':   {'code': 0xF0, 'mode': None, 'imm_bits': 0},
+    'INT':   {'code': 0xF0, 'mode': None, 'imm_bits': 8},
     'IRET':  {'code': 0xF1, 'mode': None, 'imm_bits': 0},
+    'INPUT': {'code': 0x90, 'mode': 0,    'imm_bits': 0},
+    'OUTPUT':{'code': 0x91, 'mode': 0,    'imm_bits': 0},
+    'CAS':   {'code': 0xA0, 'mode': 0,    'imm_bits': 4},
+    'FADD':  {'code': 0xA1, 'mode': 0,    'imm_bits': 0},
+    'CPUID': {'code': 0xA2, 'mode': 0,    'imm_bits': 0},
+    # SHL/SHR solo en fixed64: el decodificador variable no los distingue
+    'SHL':   {'code': 0x28, 'mode': 1,    'imm_bits': 28},
+    'SHR':   {'code': 0x29, 'mode': 1,    'imm_bits': 28},
+    # Vectoriales: direcciones y longitud en registros (ver Instrucciones)
+    'VADD':  {'code': 0xB0, 'mode': 0,    'imm_bits': 8},
+    'VSUB':  {'code': 0xB1, 'mode': 0,    'imm_bits': 8},
+    'VMUL':  {'code': 0xB2, 'mode': 0,    'imm_bits': 8},
+    'VSUM':  {'code': 0xB3, 'mode': 0,    'imm_bits': 4},
+    'VDOT':  {'code': 0xB4, 'mode': 0,    'imm_bits': 8},
+    'VMOV':  {'code': 0xB5, 'mode': 0,    'imm_bits': 4},
+    'MMUL':  {'code': 0xB8, 'mode': 0,    'imm_bits': 4},
 }
 
+FIXED64_ONLY = {'SHL', 'SHR'}
+
+# Sintaxis de operandos por mnemonico (compartida con disassembler.py):
+#   none: sin operandos               r:   un registro (formato corto)
+#   r_:   un registro, r2 a cero      rr:  dos registros
+#   rrr:  tres registros (el tercero en el campo de 4 bits)
+#   rrrr: cuatro registros (tercero y cuarto en el campo de 8 bits)
+#   ri:   registro + inmediato        i:   inmediato/direccion
+#   rri:  dos registros + inmediato
+#   k:    numero sin registro (vector de INT; opcional, por defecto 0)
+OPERANDS = {}
+for _names, _syntax in (
+    (('NOP','HALT','IRET','RET'), 'none'),
+    (('INT',), 'k'),
+    (('PUSH','POP','NOT'), 'r'),
+    (('INPUT','OUTPUT','CPUID'), 'r_'),
+    (('MOV','ADD','SUB','MUL','DIV','CMP','AND','OR','XOR','FADD','LOADI','STOREI'), 'rr'),
+    (('CAS','VSUM','VMOV','MMUL'), 'rrr'),
+    (('VADD','VSUB','VMUL','VDOT'), 'rrrr'),
+    (('ADDI','SUBI','MULI','DIVI','CMPI','LOADK','LOADM','STOREM'), 'ri'),
+    (('SHL','SHR'), 'rri'),
+    (('JMP','JZ','JNZ','JN','JNN','CALL'), 'i'),
+):
+    for _n in _names:
+        OPERANDS[_n] = _syntax
+
+def variable_width(mnem: str) -> int:
+    """Ancho en bits de la instruccion en la codificacion variable."""
+    info, syntax = INSTR[mnem], OPERANDS[mnem]
+    width = 8 + (2 if info['mode'] is not None else 0)
+    if syntax == 'r':
+        width += 4 if info['mode'] is not None else 6
+    elif syntax in ('r_', 'rr'):
+        width += 8
+    elif syntax == 'rrr':
+        width += 12
+    elif syntax == 'rrrr':
+        width += 16
+    elif syntax == 'ri':
+        width += 4 + info['imm_bits']
+    elif syntax == 'rri':
+        width += 8 + info['imm_bits']
+    elif syntax in ('i', 'k'):
+        width += info['imm_bits']
+    return width
+
 def parse_register(tok: str) -> int:
     if not tok.upper().startswith('R'):
         raise ValueError(f"Invalid register '{tok}'")
@@ -59,88 +124,429 @@ def preprocess_lines(lines):
             cleaned.append(line)
     return cleaned
 
-def assemble_lines(lines):
-    lines = preprocess_lines(lines)
+def _resolve(tok, labels):
+    return labels[tok] if tok in labels else int(tok, 0)
+
+def encode_fixed64(code, mode, r1=0, r2=0, imm=0):
+    """Codificacion fija de 64 bits: opcode(8) modo(2) r1(4) r2(4) inmediato(46)."""
+    return (code << 56) | ((mode or 0) << 54) | (r1 << 50) | (r2 << 46) | (imm & MASK46)
+
+def encode_line(ln, labels, encoding=CODIF_VARIABLE):
+    """Codifica una linea de ensamblador (sin etiqueta) a una palabra binaria."""
+    parts = re.split(r'[ ,]+', ln)
+    mnem = parts[0].upper()
+    if mnem == 'INC':
+        mnem = 'ADDI'
+        parts = ['ADDI', parts[1], '1']
+    elif mnem == 'DEC':
+        mnem = 'SUBI'
+        parts = ['SUBI', parts[1], '1']
+
+    if mnem not in INSTR:
+        raise ValueError(f"Unknown mnemonic '{mnem}'")
+    info = INSTR[mnem]
+    code, mode, imm_bits = info['code'], info['mode'], info['imm_bits']
+
+    # Campos comunes a ambas codificaciones; 'layout' indica el formato variable
+    r1 = r2 = imm = 0
+    layout = OPERANDS.get(mnem)
+    if layout == 'none':
+        pass
+    elif layout == 'r':
+        r1 = parse_register(parts[1])
+    elif layout == 'rrr':
+        # CAS r1, r2, r3: el tercer registro va en el campo de 4 bits
+        r1, r2, imm = (parse_register(p) for p in parts[1:4])
+    elif layout == 'rrrr':
+        r1, r2, r3, r4 = (parse_register(p) for p in parts[1:5])
+        imm = (r3 << 4) | r4
+    elif layout == 'r_':
+        # r1 + r2 a cero: mismo formato de 18 bits que MOV
+        layout = 'rr'
+        r1 = parse_register(parts[1])
+    elif layout == 'rr':
+        r1, r2 = parse_register(parts[1]), parse_register(parts[2])
+    elif layout == 'ri':
+        r1 = parse_register(parts[1])
+        imm = _resolve(parts[2], labels)
+    elif layout == 'rri':
+        r1, r2 = parse_register(parts[1]), parse_register(parts[2])
+        imm = _resolve(parts[3], labels)
+    elif layout == 'i':
+        imm = _resolve(parts[1], labels)
+    elif layout == 'k':
+        imm = _resolve(parts[1], labels) if len(parts) > 1 else 0
+        if not 0 <= imm < (1 << imm_bits):
+            raise ValueError(f"Numero fuera de rango para {mnem}: {imm}")
+    else:
+        raise ValueError(f"Unsupported operands for '{mnem}'")
+
+    if encoding == CODIF_FIJA64:
+        return encode_fixed64(code, mode, r1, r2, imm)
+    if encoding != CODIF_VARIABLE:
+        raise ValueError(f"Codificacion desconocida: {encoding}")
+    if mnem in FIXED64_ONLY:
+        raise ValueError(f"{mnem} solo existe en la codificacion fixed64")
+
+    bits = format(code, '08b')
+    if mode is not None:
+        bits += format(mode, '02b')
+    if layout == 'r':
+        if mode is None:
+            bits += '00'
+        bits += format(r1, '04b')
+    elif layout == 'rr':
+        bits += format(r1, '04b') + format(r2, '04b')
+    elif layout == 'rrr':
+        bits += format(r1, '04b') + format(r2, '04b') + format(imm, '04b')
+    elif layout == 'rrrr':
+        bits += format(r1, '04b') + format(r2, '04b') + format(imm, '08b')
+    elif layout == 'ri':
+        bits += format(r1, '04b') + format(imm & ((1 << imm_bits) - 1), f'0{imm_bits}b')
+    elif layout == 'rri':
+        bits += format(r1, '04b') + format(r2, '04b') + format(imm & ((1 << imm_bits) - 1), f'0{imm_bits}b')
+    elif layout in ('i', 'k'):
+        bits += format(imm & ((1 << imm_bits) - 1), f'0{imm_bits}b')
+
+    if len(bits) < 8:
+        raise ValueError(f"Instruccin invlida: '{ln}' genera solo {len(bits)} bits")
+    return int(bits, 2)
+
+DATA_BASE = 0x2000  # origen por defecto del segmento de datos
+DATA_DIRECTIVES = ('.word', '.space', '.incbin')
+
+def _split_labels(lines):
+    """Separa 'etiqueta: resto' en dos entradas; devuelve [(num_linea, texto)]."""
+    items = []
     for idx, ln in enumerate(lines, start=1):
-        print(f" ensamblando lnea: {ln}")
+        m = re.match(r'^(\w+):\s*(.*)$', ln)
+        if m:
+            items.append((idx, m.group(1) + ':'))
+            if m.group(2):
+                items.append((idx, m.group(2)))
+        else:
+            items.append((idx, ln))
+    return items
+
+def _directive(ln):
+    return ln.split(None, 1)[0].lower() if ln.startswith('.') else None
+
+def _incbin_words(arg, base_dir):
+    """Lee un archivo binario y lo empaqueta en palabras de 64 bits little-endian."""
+    path = arg.strip().strip('"')
+    if base_dir and not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    raw += b'\0' * (-len(raw) % 8)
+    return [int.from_bytes(raw[i:i + 8], 'little') for i in range(0, len(raw), 8)]
+
+class _SymbolUse(dict):
+    """Tabla de etiquetas que anota que simbolos se consultan al codificar."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.used = []
+
+    def __getitem__(self, key):
+        self.used.append(key)
+        return super().__getitem__(key)
+
+def _symbol_list(ln):
+    return [s for s in re.split(r'[ ,]+', ln.split(None, 1)[1].strip()) if s]
+
+class ObjectModule:
+    """
+    Modulo reubicable producido por assemble_object.
+    code: palabras con las etiquetas de codigo relativas al inicio del modulo.
+    data: segmentos (direccion, [palabras]); las direcciones de datos son
+    absolutas (.org), no se reubican.
+    symbols: nombre -> ('code', desplazamiento) | ('abs', direccion).
+    exports / imports: simbolos de .global / .extern.
+    relocs: (segmento 'code'|'data', posicion, simbolo o None, sumando, bits).
+    Con simbolo None el valor final es inicio_del_modulo + sumando; si no,
+    direccion_del_simbolo + sumando. 'bits' es el ancho del campo a parchear.
+    """
+
+    def __init__(self, name='', encoding=CODIF_VARIABLE):
+        self.name = name
+        self.encoding = encoding
+        self.code = []
+        self.data = []
+        self.symbols = {}
+        self.exports = []
+        self.imports = []
+        self.relocs = []
+
+    def to_dict(self):
+        return {'name': self.name, 'encoding': self.encoding, 'code': self.code,
+                'data': [[a, w] for a, w in self.data],
+                'symbols': {k: list(v) for k, v in self.symbols.items()},
+                'exports': self.exports, 'imports': self.imports,
+                'relocs': [list(r) for r in self.relocs]}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d['name'], d['encoding'])
+        obj.code = list(d['code'])
+        obj.data = [(a, list(w)) for a, w in d['data']]
+        obj.symbols = {k: tuple(v) for k, v in d['symbols'].items()}
+        obj.exports = list(d['exports'])
+        obj.imports = list(d['imports'])
+        obj.relocs = [tuple(r) for r in d['relocs']]
+        return obj
+
+# Ensamblado en paralelo: tras la pasada de etiquetas cada linea se codifica
+# de forma independiente. Cada proceso recibe la tabla de etiquetas una sola
+# vez (inicializador) y codifica bloques contiguos de lineas.
+PARALLEL_MIN_LINES = 20000
+_worker_labels = None
+_worker_encoding = None
+
+def _init_worker(labels, encoding):
+    global _worker_labels, _worker_encoding
+    _worker_labels, _worker_encoding = labels, encoding
 
-    # Primera pasada: etiquetas
+def _encode_chunk(chunk):
+    out = []
+    for idx, ln in chunk:
+        try:
+            out.append(encode_line(ln, _worker_labels, _worker_encoding))
+        except Exception as e:
+            raise ValueError(f" Error en lnea {idx}: \"{ln}\" -> {e}")
+    return out
+
+def _encode_parallel(items, labels, encoding, workers):
+    """Codifica [(num_linea, texto)] en un pool de procesos conservando el orden."""
+    from concurrent.futures import ProcessPoolExecutor
+    size = -(-len(items) // (workers * 4))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    output = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(labels, encoding)) as pool:
+        # map devuelve los bloques en orden: el primer error es el de la linea mas baja
+        for words in pool.map(_encode_chunk, chunks):
+            output.extend(words)
+    return output
+
+def _assemble(lines, encoding, base_dir, source_map, obj, workers=None):
+    """Pasadas comunes de assemble_program y assemble_object."""
+    if source_map is not None:
+        # Indices originales de las lineas que sobreviven al preprocesado
+        kept = [i for i, l in enumerate(lines) if re.sub(r";.*", "", l).strip()]
+        source_map.pc_asm = []
+    lines = preprocess_lines(lines)
+    # Los objetos registran reubicaciones al codificar: siempre en secuencia
+    parallel = bool(workers and workers > 1 and obj is None and len(lines) >= PARALLEL_MIN_LINES)
+    if parallel:
+        print(f" ensamblando {len(lines)} lneas con {workers} procesos")
+    else:
+        for idx, ln in enumerate(lines, start=1):
+            print(f" ensamblando lnea: {ln}")
+    items = _split_labels(lines)
+
+    # Primera pasada: etiquetas (de codigo o de datos) y contenido de .incbin
     labels = {}
+    code_labels = set()
+    exports, imports = [], []
+    pending = []
     addr = 0
-    for ln in lines:
-        m = re.match(r'^(\w+):$', ln)
-        if m:
-            labels[m.group(1)] = addr
-        else:
-            addr += 1
+    data_addr = DATA_BASE
+    incbins = {}
+    for pos, (idx, ln) in enumerate(items):
+        try:
+            if ln.endswith(':'):
+                pending.append(ln[:-1])
+                continue
+            d = _directive(ln)
+            if d == '.org':
+                data_addr = int(ln.split(None, 1)[1], 0)
+                continue
+            if d in ('.global', '.extern'):
+                if d == '.extern' and obj is None:
+                    raise ValueError("'.extern' requiere ensamblar como objeto (assemble_object)")
+                (exports if d == '.global' else imports).extend(_symbol_list(ln))
+                continue
+            target = data_addr if d in DATA_DIRECTIVES else addr
+            for name in pending:
+                labels[name] = target
+                if d not in DATA_DIRECTIVES:
+                    code_labels.add(name)
+            pending = []
+            if d == '.word':
+                data_addr += len(re.split(r'[ ,]+', ln.split(None, 1)[1].strip()))
+            elif d == '.space':
+                data_addr += int(ln.split(None, 1)[1], 0)
+            elif d == '.incbin':
+                incbins[pos] = _incbin_words(ln.split(None, 1)[1], base_dir)
+                data_addr += len(incbins[pos])
+            elif d is not None:
+                raise ValueError(f"Directiva desconocida '{d}'")
+            else:
+                addr += 1
+        except Exception as e:
+            raise ValueError(f" Error en lnea {idx}: \"{ln}\" -> {e}")
+    for name in pending:
+        labels[name] = addr
+        code_labels.add(name)
+
+    if obj is not None:
+        for name in imports:
+            if name in labels:
+                raise ValueError(f"Simbolo '{name}' declarado .extern y definido en el modulo")
+        for name in exports:
+            if name not in labels:
+                raise ValueError(f"Simbolo exportado '{name}' no definido")
+        obj.symbols = {name: ('code' if name in code_labels else 'abs', val)
+                       for name, val in labels.items()}
+        obj.exports, obj.imports = exports, imports
+        # Los simbolos externos valen 0 hasta el enlazado
+        labels = _SymbolUse(labels, **{name: 0 for name in imports})
 
-    # Segunda pasada: generacin de binario
+    def relocation(seg, where, bits):
+        """Registra la reubicacion del ultimo simbolo consultado, si la necesita."""
+        if obj is None or not labels.used:
+            return
+        sym = labels.used[-1]
+        labels.used.clear()
+        if sym in imports:
+            obj.relocs.append((seg, where, sym, 0, bits))
+        elif sym in code_labels:
+            obj.relocs.append((seg, where, None, dict.get(labels, sym), bits))
+
+    # Segunda pasada: generacin de binario y segmentos de datos
     output = []
-    for idx, ln in enumerate(lines, start=1):
-        if re.match(r'^(\w+):$', ln):
+    code_items = []  # modo paralelo: lineas de codigo pendientes de codificar
+    data = []
+    data_addr = DATA_BASE
+
+    def emit_data(words):
+        if data and data[-1][0] + len(data[-1][1]) == data_addr:
+            data[-1][1].extend(words)
+        else:
+            data.append((data_addr, list(words)))
+
+    for pos, (idx, ln) in enumerate(items):
+        if ln.endswith(':'):
             continue
         try:
-            parts = re.split(r'[ ,]+', ln)
-            mnem = parts[0].upper()
-            if mnem == 'INC':
-                mnem = 'ADDI'
-                parts = ['ADDI', parts[1], '1']
-            elif mnem == 'DEC':
-                mnem = 'SUBI'
-                parts = ['SUBI', parts[1], '1']
-
-            if mnem not in INSTR:
-                raise ValueError(f"Unknown mnemonic '{mnem}'")
-            info = INSTR[mnem]
-            code, mode, imm_bits = info['code'], info['mode'], info['imm_bits']
-            bits = format(code, '08b')
-            if mode is not None:
-                bits += format(mode, '02b')
-
-            if mnem in ('NOP','HALT','INT','IRET','RET'):
-                pass
-            elif mnem in ('PUSH','POP','NOT'):
-                r = parse_register(parts[1])
-                if mode is None:
-                    bits += '00'
-                bits += format(r, '04b')
-            elif mnem in ('MOV','ADD','SUB','MUL','DIV','CMP','AND','OR','XOR'):
-                r1, r2 = parse_register(parts[1]), parse_register(parts[2])
-                bits += format(r1, '04b') + format(r2, '04b')
-            elif mnem in ('ADDI','SUBI','MULI','DIVI','CMPI','LOADK','LOADM','STOREM'):
-                r = parse_register(parts[1])
-                val = parts[2]
-                imm = labels[val] if val in labels else int(val, 0)
-                bits += format(r, '04b') + format(imm & ((1 << imm_bits) - 1), f'0{imm_bits}b')
-            elif mnem in ('LOADI','STOREI'):
-                r1, r2 = parse_register(parts[1]), parse_register(parts[2])
-                bits += format(r1, '04b') + format(r2, '04b')
-            elif mnem in ('JMP','JZ','JNZ','JN','JNN','CALL'):
-                tgt = parts[1]
-                addr = labels[tgt] if tgt in labels else int(tgt, 0)
-                bits += format(addr & ((1 << imm_bits) - 1), f'0{imm_bits}b')
+            d = _directive(ln)
+            if d == '.org':
+                data_addr = int(ln.split(None, 1)[1], 0)
+            elif d in ('.global', '.extern'):
+                continue
+            elif d == '.word':
+                vals = re.split(r'[ ,]+', ln.split(None, 1)[1].strip())
+                words = []
+                for v in vals:
+                    words.append(_resolve(v, labels) & 0xFFFFFFFFFFFFFFFF)
+                    relocation('data', data_addr + len(words) - 1, 64)
+                emit_data(words)
+                data_addr += len(words)
+            elif d == '.space':
+                # Memoria lee 0 en posiciones no escritas: solo se reserva espacio
+                data_addr += int(ln.split(None, 1)[1], 0)
+            elif d == '.incbin':
+                emit_data(incbins[pos])
+                data_addr += len(incbins[pos])
+            elif parallel:
+                code_items.append((idx, str(ln)))
+                if source_map is not None:
+                    source_map.pc_asm.append(kept[idx - 1])
             else:
-                raise ValueError(f"Unsupported operands for '{mnem}'")
-
-            if len(bits) < 8:
-                raise ValueError(f"Instruccin invlida: '{ln}' genera solo {len(bits)} bits")
-            bin_instr = int(bits, 2)
-            output.append(bin_instr)
+                output.append(encode_line(ln, labels, encoding))
+                if obj is not None and labels.used:
+                    mnem = ln.split(None, 1)[0].upper()
+                    bits = 46 if encoding == CODIF_FIJA64 else INSTR[mnem]['imm_bits']
+                    relocation('code', len(output) - 1, bits)
+                if source_map is not None:
+                    source_map.pc_asm.append(kept[idx - 1])
         except Exception as e:
             raise ValueError(f" Error en lnea {idx}: \"{ln}\" -> {e}")
 
-    print(" Instrucciones binarias generadas:", [(i, instr, f"{instr:b}", f"{instr.bit_length()} bits") for i, instr in enumerate(output, start=1)])
-    return output
+    if parallel:
+        output = _encode_parallel(code_items, labels, encoding, workers)
+        print(f" Instrucciones binarias generadas: {len(output)}")
+    else:
+        print(" Instrucciones binarias generadas:", [(i, instr, f"{instr:b}", f"{instr.bit_length()} bits") for i, instr in enumerate(output, start=1)])
+    return output, data
+
+def assemble_program(lines, encoding=CODIF_VARIABLE, header=False, base_dir=None,
+                     source_map=None, workers=None):
+    """
+    Ensambla lineas de texto a (codigo, datos).
+    codigo: lista de palabras de instrucciones.
+    datos: lista de segmentos (direccion, [palabras]) generados por las
+    directivas .org/.word/.space/.incbin, para cargarlos en bloque.
+    encoding: CODIF_VARIABLE (formato original) o CODIF_FIJA64.
+    header: en modo fijo, antepone MAGIC_FIJA64 para que el cargador
+    detecte la codificacion automaticamente.
+    source_map: SourceMap opcional; recibe, para cada palabra de codigo,
+    el indice de la linea de entrada que la genero.
+    workers: si es mayor que 1, las lineas de codigo se codifican en un pool
+    de ese numero de procesos (solo a partir de PARALLEL_MIN_LINES lineas;
+    se imprime un resumen en lugar de cada linea).
+    """
+    output, data = _assemble(lines, encoding, base_dir, source_map, None, workers)
+    if header and encoding == CODIF_FIJA64:
+        output.insert(0, MAGIC_FIJA64)
+    return output, data
+
+def assemble_object(lines, name='', encoding=CODIF_VARIABLE, base_dir=None):
+    """
+    Ensambla un modulo por separado a un ObjectModule reubicable.
+    '.global a, b' exporta etiquetas y '.extern c' declara simbolos de otros
+    modulos; los inmediatos que usan etiquetas de codigo o simbolos externos
+    (JMP/CALL/LOADK...) y los .word que las contienen quedan como
+    reubicaciones que resuelve linker.link.
+    """
+    obj = ObjectModule(name, encoding)
+    obj.code, obj.data = _assemble(lines, encoding, base_dir, None, obj)
+    return obj
 
-def assemble_file(path: str):
+def assemble_lines(lines, encoding=CODIF_VARIABLE, header=False, base_dir=None, workers=None):
+    """
+    Ensambla lineas de texto a una lista de palabras de codigo.
+    Si el programa usa directivas de datos, usar assemble_program para
+    obtener tambien el segmento de datos.
+    """
+    return assemble_program(lines, encoding, header, base_dir, workers=workers)[0]
+
+def assemble_program_file(path: str, encoding=CODIF_VARIABLE, header=False, workers=None):
+    """Como assemble_program sobre un archivo: devuelve (codigo, datos)."""
     with open(path, 'r', encoding='utf-8') as f:
         lines = f.read().splitlines()
-    return assemble_lines(lines)
+    return assemble_program(lines, encoding, header, os.path.dirname(os.path.abspath(path)),
+                            workers=workers)
+
+def assemble_file(path: str, encoding=CODIF_VARIABLE, header=False, workers=None):
+    """
+    Ensambla un archivo a una lista de palabras de codigo, como
+    assemble_lines; para el segmento de datos usar assemble_program_file.
+    """
+    return assemble_program_file(path, encoding, header, workers)[0]
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Uso: python assembler.py <archivo_fuente>")
+    args = sys.argv[1:]
+    workers = None
+    if '-j' in args:
+        # '-j N' fija los procesos; '-j' solo usa todos los nucleos
+        i = args.index('-j')
+        if i + 1 < len(args) and args[i + 1].isdigit():
+            workers = int(args[i + 1])
+            del args[i:i + 2]
+        else:
+            workers = os.cpu_count()
+            del args[i]
+    args = [a for a in args if a != '--fixed64']
+    if len(args) != 1:
+        print("Uso: python assembler.py [--fixed64] [-j procesos] <archivo_fuente>")
         sys.exit(1)
-    binary = assemble_file(sys.argv[1])
+    if '--fixed64' in sys.argv:
+        binary, data = assemble_program_file(args[0], CODIF_FIJA64, header=True, workers=workers)
+    else:
+        binary, data = assemble_program_file(args[0], workers=workers)
     for b in binary:
         print(b)
+    if data:
+        print(f"Segmento de datos: {sum(len(w) for _, w in data)} palabras en {len(data)} bloques (no incluido en la salida)", file=sys.stderr)
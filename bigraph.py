@@ -1,6 +1,7 @@
 class Node:
-    def __init__(self, name, ports=None):
+    def __init__(self, name, ports=None, lineno=None):
         self.name = name
+        self.lineno = lineno  # linea del fuente que creo el nodo
         self.ports = ports or []
         self.children = []
         self.parent = None
@@ -23,6 +24,7 @@ class Bigraph:
         self.nodes = []
         self.links = []
         self.instructions = []
+        self.instruction_lines = []  # linea de fuente de cada instruccion
 
     def add_node(self, node, parent=None):
         if parent:
@@ -30,9 +32,10 @@ class Bigraph:
             node.parent = parent
         self.nodes.append(node)
 
-    def add_instruction(self, line):
+    def add_instruction(self, line, src_line=None):
         if line and line.strip():  #  Asegura que la instruccin no sea vaca
             self.instructions.append(line.strip())
+            self.instruction_lines.append(src_line)
 
     def add_link(self, link):
         self.links.append(link)
@@ -50,14 +53,20 @@ class BigraphCompiler:
     def __init__(self, bigraph):
         self.bigraph = bigraph
         self.assembly_lines = []
+        self.line_sources = []  # linea de fuente de cada linea generada
 
     def compile(self):
         for node in self.bigraph.nodes:
+            start = len(self.assembly_lines)
             self.compile_node(node)
+            self.line_sources += [node.lineno] * (len(self.assembly_lines) - start)
 
         #  Asegura que no haya lneas vacas antes de HALT
-        self.assembly_lines = [l for l in self.assembly_lines if l.strip()]
+        kept = [(l, s) for l, s in zip(self.assembly_lines, self.line_sources) if l.strip()]
+        self.assembly_lines = [l for l, _ in kept]
+        self.line_sources = [s for _, s in kept]
         self.assembly_lines.append("HALT")
+        self.line_sources.append(None)
         return self.assembly_lines
 
     def compile_node(self, node):
@@ -73,7 +82,8 @@ class BigraphCompiler:
         elif node.name == "procers":
             self.compile_procers(node)
         elif node.name == "colectavgB":
-            self.assembly_lines.append("NOP  ; colectavgB simulada")
+            # La llamada (INT) la emite el parser en su posicion del programa
+            self.assembly_lines.append("; colectavgB: servicio del anfitrion")
         elif node.name == "while":
             self.assembly_lines.append("NOP  ; inicio while")
             for child in node.children:
@@ -83,7 +93,7 @@ class BigraphCompiler:
             self.assembly_lines.append(f"; Nodo no reconocido: {node.name}")
 
     def compile_procers(self, node: Node):
-        self.assembly_lines.append("NOP  ; inicio de bloque procers")
+        self.assembly_lines.append("; inicio de bloque procers (servicio del anfitrion)")
         for child in node.children:
             self.compile_node(child)
-        self.assembly_lines.append("NOP  ; fin de bloque procers")
+        self.assembly_lines.append("; fin de bloque procers")
@@ -0,0 +1,222 @@
+"""
+Modelo opcional de jerarquia de caches entre la CPU y la memoria.
+
+``JerarquiaCache`` es una memoria envuelta (como MemoriaES o
+MemoriaVigilada): cada leer/escribir se busca en los niveles en orden
+(L1, L2, ...) y, si ninguno tiene la linea, se cuenta un acceso a memoria.
+Los niveles que fallaron se rellenan con la linea. Los valores siempre se
+leen y escriben en la memoria interior, asi que el modelo no altera la
+ejecucion: solo cuenta aciertos, fallos y ciclos.
+
+Solo se intercala si se pasa a run_instructions / cargar_programa; sin ella
+los accesos van directos a Memoria y no pagan nada. El programa y los datos
+iniciales se cargan antes de intercalarla, asi que no cuentan.
+
+Tamanos en palabras. Los ciclos de un acceso son la suma de las latencias
+de los niveles consultados, mas la de memoria si todos fallaron. Las
+escrituras siguen la politica write-back con asignacion en escritura: las
+lineas sucias expulsadas se cuentan como escrituras diferidas.
+"""
+import random
+from collections import defaultdict
+
+from instrucciones import MemoriaEnvuelta
+
+POLITICAS = ('lru', 'fifo', 'aleatoria')
+
+
+class NivelCache:
+    """Un nivel de cache asociativo por conjuntos."""
+
+    def __init__(self, nombre, tamano, linea=8, asociatividad=4, politica='lru', latencia=4):
+        if politica not in POLITICAS:
+            raise ValueError(f"Politica de reemplazo desconocida '{politica}' (usar {', '.join(POLITICAS)})")
+        if linea <= 0 or asociatividad <= 0 or tamano <= 0 or tamano % (linea * asociatividad):
+            raise ValueError(f"{nombre}: el tamano ({tamano}) debe ser multiplo de linea * asociatividad "
+                             f"({linea} * {asociatividad})")
+        self.nombre = nombre
+        self.tamano = tamano
+        self.linea = linea
+        self.asociatividad = asociatividad
+        self.politica = politica
+        self.latencia = latencia
+        self.n_conjuntos = tamano // (linea * asociatividad)
+        # Cada conjunto: bloque -> sucia, en orden de reemplazo (el primero es la victima)
+        self.conjuntos = [{} for _ in range(self.n_conjuntos)]
+        self._lru = politica == 'lru'
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.escrituras_diferidas = 0
+
+    def acceder(self, bloque, escritura):
+        """Devuelve True si el bloque esta en el nivel (y actualiza su estado)."""
+        conjunto = self.conjuntos[bloque % self.n_conjuntos]
+        if bloque in conjunto:
+            self.aciertos += 1
+            if self._lru:
+                conjunto[bloque] = conjunto.pop(bloque) or escritura
+            elif escritura:
+                conjunto[bloque] = True
+            return True
+        self.fallos += 1
+        return False
+
+    def instalar(self, bloque, sucia):
+        conjunto = self.conjuntos[bloque % self.n_conjuntos]
+        if len(conjunto) >= self.asociatividad:
+            if self.politica == 'aleatoria':
+                victima = random.choice(list(conjunto))
+            else:
+                victima = next(iter(conjunto))
+            if conjunto.pop(victima):
+                self.escrituras_diferidas += 1
+            self.expulsiones += 1
+        conjunto[bloque] = sucia
+
+    @property
+    def tasa_aciertos(self):
+        total = self.aciertos + self.fallos
+        return self.aciertos / total if total else 0.0
+
+
+def niveles_por_defecto():
+    """L1 de 4 KiB y L2 de 64 KiB (palabras de 64 bits), lineas de 64 bytes."""
+    return [NivelCache('L1', 512, linea=8, asociatividad=4, latencia=4),
+            NivelCache('L2', 8192, linea=8, asociatividad=8, latencia=12)]
+
+
+def parse_niveles(texto):
+    """
+    Niveles a partir de 'nombre:tamano:linea:asociatividad[:politica[:latencia]]'
+    separados por comas, p. ej. 'L1:256:8:2:lru:3,L2:4096:8:8:fifo:10'.
+    """
+    niveles = []
+    for parte in texto.split(','):
+        campos = parte.strip().split(':')
+        if len(campos) < 4:
+            raise ValueError(f"Nivel de cache mal formado '{parte}'")
+        nombre, tamano, linea, asoc = campos[0], int(campos[1], 0), int(campos[2], 0), int(campos[3], 0)
+        politica = campos[4].lower() if len(campos) > 4 else 'lru'
+        latencia = int(campos[5], 0) if len(campos) > 5 else 4 * (len(niveles) * 2 + 1)
+        niveles.append(NivelCache(nombre, tamano, linea, asoc, politica, latencia))
+    return niveles
+
+
+class JerarquiaCache(MemoriaEnvuelta):
+    """
+    Memoria envuelta que modela los niveles de cache y acumula estadisticas
+    por nivel y un mapa de calor por pagina. Se crea sin memoria interior y
+    _preparar (cpu_core.py) la intercala con envolver().
+    """
+
+    def __init__(self, niveles=None, latencia_memoria=100, tam_pagina=512):
+        if niveles is not None and not niveles:
+            raise ValueError("La jerarquia necesita al menos un nivel")
+        super().__init__(None)
+        self.niveles = niveles if niveles is not None else niveles_por_defecto()
+        self.latencia_memoria = latencia_memoria
+        self.tam_pagina = tam_pagina
+        self.ciclos = 0
+        self.accesos_memoria = 0
+        # pagina -> [lecturas, escrituras, accesos a memoria]
+        self.paginas = defaultdict(lambda: [0, 0, 0])
+        self._ultimo = None   # bloque de L1 del ultimo acceso
+
+    def envolver(self, interior):
+        self.interior = interior
+        return self
+
+    def _acceso(self, direccion, escritura):
+        self.paginas[direccion // self.tam_pagina][escritura] += 1
+        l1 = self.niveles[0]
+        bloque = direccion // l1.linea
+        if bloque == self._ultimo:
+            # Misma linea que el acceso anterior: ya esta en L1 y es la mas
+            # reciente, no hace falta tocar el conjunto salvo para ensuciarla
+            l1.aciertos += 1
+            if escritura:
+                l1.conjuntos[bloque % l1.n_conjuntos][bloque] = True
+            self.ciclos += l1.latencia
+            return
+        self._ultimo = bloque
+
+        ciclos = 0
+        fallidos = 0
+        for nivel in self.niveles:
+            ciclos += nivel.latencia
+            if nivel.acceder(direccion // nivel.linea, escritura):
+                break
+            fallidos += 1
+        else:
+            ciclos += self.latencia_memoria
+            self.accesos_memoria += 1
+            self.paginas[direccion // self.tam_pagina][2] += 1
+        for i in range(fallidos):
+            nivel = self.niveles[i]
+            nivel.instalar(direccion // nivel.linea, bool(escritura) and i == 0)
+        self.ciclos += ciclos
+
+    def leer(self, direccion):
+        self._acceso(direccion, 0)
+        return self.interior.leer(direccion)
+
+    def escribir(self, direccion, valor):
+        self._acceso(direccion, 1)
+        self.interior.escribir(direccion, valor)
+
+    def cargar(self, direccion, valores):
+        # Escrituras en bloque de las instrucciones vectoriales; la carga del
+        # programa se hace antes de intercalar la jerarquia (_preparar)
+        for d in range(direccion, direccion + len(valores)):
+            self._acceso(d, 1)
+        self.interior.cargar(direccion, valores)
+
+    def leer_bloque(self, direccion, n):
+        for d in range(direccion, direccion + n):
+            self._acceso(d, 0)
+        return self.interior.leer_bloque(direccion, n)
+
+    @property
+    def accesos(self):
+        l1 = self.niveles[0]
+        return l1.aciertos + l1.fallos
+
+    def estadisticas(self):
+        """Lista de diccionarios con los contadores de cada nivel."""
+        return [{'nivel': n.nombre, 'aciertos': n.aciertos, 'fallos': n.fallos,
+                 'tasa': n.tasa_aciertos, 'expulsiones': n.expulsiones,
+                 'escrituras_diferidas': n.escrituras_diferidas}
+                for n in self.niveles]
+
+    def mapa_calor(self, orden='accesos'):
+        """
+        Lista de (pagina, lecturas, escrituras, accesos_memoria).
+        orden: 'accesos' (mas accedidas primero), 'memoria' o 'pagina'.
+        """
+        filas = [(p, l, e, m) for p, (l, e, m) in self.paginas.items()]
+        if orden == 'pagina':
+            filas.sort()
+        elif orden == 'memoria':
+            filas.sort(key=lambda f: -f[3])
+        else:
+            filas.sort(key=lambda f: -(f[1] + f[2]))
+        return filas
+
+    def informe(self, paginas=10, ancho=40):
+        out = [f"{'nivel':<6} {'aciertos':>10} {'fallos':>10} {'tasa':>7} {'expuls.':>9} {'write-back':>10}"]
+        for n in self.niveles:
+            out.append(f"{n.nombre:<6} {n.aciertos:>10} {n.fallos:>10} {100 * n.tasa_aciertos:>6.1f}% "
+                       f"{n.expulsiones:>9} {n.escrituras_diferidas:>10}")
+        accesos = self.accesos
+        out.append(f"Accesos: {accesos}  a memoria: {self.accesos_memoria}  ciclos: {self.ciclos}  "
+                   f"ciclos/acceso: {self.ciclos / accesos if accesos else 0:.2f}")
+
+        filas = self.mapa_calor()[:paginas]
+        if filas:
+            maximo = filas[0][1] + filas[0][2]
+            out.append(f"\n{'pagina':>12} {'lecturas':>10} {'escrituras':>10} {'a memoria':>10}")
+            for p, l, e, m in filas:
+                barra = '#' * max(1, round(ancho * (l + e) / maximo))
+                out.append(f"{p * self.tam_pagina:>#12x} {l:>10} {e:>10} {m:>10}  {barra}")
+        return "\n".join(out)
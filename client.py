@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Cliente ligero del servidor de compilacion (server.py).
+
+Uso equivalente a main.py:
+    python client.py <archivo.stre>
+con opciones extra para el servidor y el tipo de carga (.asm/.s se envian
+como ensamblador y .bin como binario, uno o varios enteros por linea).
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def request(payload, host='127.0.0.1', port=8765, socket_path=None, timeout=None):
+    """Envia una peticion /run y devuelve la respuesta decodificada."""
+    if socket_path:
+        conn = _UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        body = json.dumps(payload)
+        conn.request('POST', '/run', body, {'Content-Type': 'application/json'})
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def _kind_for(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.asm', '.s'):
+        return 'asm'
+    if ext == '.bin':
+        return 'binary'
+    return 'source'
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cliente del servidor de compilacion")
+    ap.add_argument('archivo')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--socket', help="ruta de socket Unix del servidor")
+    ap.add_argument('--kind', choices=('source', 'asm', 'binary'))
+    ap.add_argument('--encoding', choices=('variable', 'fixed64'))
+    ap.add_argument('--max-steps', type=int)
+    ap.add_argument('--input', help="valores de entrada separados por comas")
+    ap.add_argument('--log', action='store_true', help="mostrar la salida del pipeline")
+    args = ap.parse_args(argv)
+
+    if not os.path.isfile(args.archivo):
+        print(f" Archivo no encontrado: {args.archivo}")
+        return 1
+    with open(args.archivo, 'r', encoding='utf-8') as f:
+        code = f.read()
+
+    payload = {'kind': args.kind or _kind_for(args.archivo), 'code': code, 'log': args.log}
+    if args.encoding:
+        payload['encoding'] = args.encoding
+    if args.max_steps:
+        payload['max_steps'] = args.max_steps
+    if args.input:
+        payload['input'] = [int(v, 0) for v in args.input.split(',')]
+
+    res = request(payload, args.host, args.port, args.socket)
+    if res.get('log'):
+        print(res['log'])
+    if not res.get('ok'):
+        print(f" Error: {res.get('error')}")
+        return 1
+
+    for val in res.get('output', []):
+        print(f"Salida: {val}")
+    print("\n Estado final de los registros:")
+    for i, val in enumerate(res['registers']):
+        print(f"   R{i}: {val}")
+    print(f"\n Programa finalizado correctamente ({res['elapsed'] * 1000:.2f} ms).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
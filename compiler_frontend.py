@@ -1,13 +1,25 @@
 from lexer_1 import lexer
-from parser_2 import parser, global_bigraph
+import parser_2
+from parser_2 import parser, global_bigraph, reset_state
 from bigraph import BigraphCompiler
 from assembler import preprocess_lines
 
 
-def compile_high_level_code(source_code: str) -> list[str]:
+def compile_high_level_code(source_code: str, source_map=None, encoding='variable') -> list[str]:
+    """
+    Compila el lenguaje de alto nivel a lineas de ensamblador.
+    source_map: SourceMap opcional que se rellena con la linea de fuente
+    de cada linea de ensamblador devuelta.
+    encoding: codificacion con la que se ensamblara el resultado; con
+    'fixed64' las multiplicaciones por potencias de 2 se emiten como SHL.
+    """
     try:
         print(" Paso 1: Compilando lenguaje de alto nivel a ensamblador...")
 
+        # El parser guarda estado global: empezar limpio en cada compilacion
+        reset_state()
+        parser_2.use_shifts = encoding == 'fixed64'
+        lexer.lineno = 1
         parser.parse(source_code, lexer=lexer, tracking=True)
 
         if global_bigraph.instructions:
@@ -26,7 +38,12 @@ def compile_high_level_code(source_code: str) -> list[str]:
 
         #  Filtrado estricto
         combined_code = global_bigraph.instructions + assembly_code
-        cleaned_code = [line.strip() for line in combined_code if line.strip() and not line.strip().startswith(";")]
+        combined_src = global_bigraph.instruction_lines + compiler.line_sources
+        kept = [(line.strip(), src) for line, src in zip(combined_code, combined_src)
+                if line.strip() and not line.strip().startswith(";")]
+        cleaned_code = [line for line, _ in kept]
+        if source_map is not None:
+            source_map.set_asm(cleaned_code, [src for _, src in kept])
 
         print(" Instrucciones compiladas antes del ensamblado:")
         for i, line in enumerate(cleaned_code):
@@ -1,18 +1,213 @@
-from instrucciones import CPU, Memoria
+import asyncio
+import time
 
-def run_instructions(instrs, base=0x0):
-    cpu = CPU()
-    mem = Memoria()
+from instrucciones import CPU, Memoria, CODIF_VARIABLE, CODIF_FIJA64, MAGIC_FIJA64
+from fusion import detectar_fusiones
 
-    for i, instr in enumerate(instrs):
-        mem.escribir(base + i, instr)
+def detectar_codificacion(instrs, codificacion=None):
+    """
+    Devuelve (codificacion, instrs) quitando la cabecera MAGIC_FIJA64 si existe.
+    Sin cabecera ni opcion explicita se asume la codificacion variable original.
+    """
+    instrs = list(instrs)
+    tiene_cabecera = bool(instrs) and instrs[0] == MAGIC_FIJA64
+    if tiene_cabecera:
+        instrs = instrs[1:]
+    if codificacion is None:
+        codificacion = CODIF_FIJA64 if tiene_cabecera else CODIF_VARIABLE
+    return codificacion, instrs
 
-    cpu.PC = base
+def _despachador(cpu):
+    """Funcion que ejecuta una palabra ya leida de memoria."""
+    if cpu.codificacion == CODIF_FIJA64:
+        tabla = cpu.instrucciones.tabla
+        return lambda instr: tabla[instr >> 56](instr)
+    return cpu.ejecutar
+
+class LimiteExcedido(RuntimeError):
+    """El programa supero el numero maximo de instrucciones permitido."""
 
+def _run_limitado(cpu, mem, max_pasos):
+    """Bucle de ejecucion que se detiene tras max_pasos instrucciones."""
+    ejecutar = _despachador(cpu)
+    pasos = 0
     while cpu.running:
+        if pasos >= max_pasos:
+            raise LimiteExcedido(f"Limite de {max_pasos} instrucciones excedido (PC={cpu.PC})")
         instr = mem.leer(cpu.PC)
-        cpu.ejecutar(instr, mem)
+        ejecutar(instr)
+        pasos += 1
+        if cpu.running:
+            cpu.PC += 1
+
+def _run_perfilado(cpu, mem, perfil, max_pasos=None):
+    """Bucle de ejecucion que acumula ejecuciones y tiempo por PC en perfil."""
+    ejecutar = _despachador(cpu)
+    cuentas, tiempos = perfil.counts, perfil.time_ns
+    reloj = time.perf_counter_ns
+    pasos = 0
+    while cpu.running:
+        if max_pasos is not None and pasos >= max_pasos:
+            raise LimiteExcedido(f"Limite de {max_pasos} instrucciones excedido (PC={cpu.PC})")
+        pc = cpu.PC
+        instr = mem.leer(pc)
+        t0 = reloj()
+        ejecutar(instr)
+        tiempos[pc] += reloj() - t0
+        cuentas[pc] += 1
+        pasos += 1
+        if cpu.running:
+            cpu.PC += 1
+
+def _run_fusionado(cpu, mem, base, n, max_pasos=None):
+    """Bucle de ejecucion con superinstrucciones (ver fusion.py)."""
+    fusiones, informe = detectar_fusiones(cpu, mem, base, n)
+    cpu.informe_fusion = informe
+    ejecutar = _despachador(cpu)
+    buscar = fusiones.get
+    disparos = informe.disparos
+    pasos = 0
+    while cpu.running:
+        if max_pasos is not None:
+            if pasos >= max_pasos:
+                raise LimiteExcedido(f"Limite de {max_pasos} instrucciones excedido (PC={cpu.PC})")
+            pasos += 1
+        pc = cpu.PC
+        instr = mem.leer(pc)
+        f = buscar(pc)
+        if f is not None and f[0] == instr and mem.leer(pc + 1) == f[1]:
+            f[2]()
+            disparos[pc] += 1
+        else:
+            ejecutar(instr)
         if cpu.running:
             cpu.PC += 1
 
+def _preparar(instrs, base, io, codificacion, datos, cache=None):
+    """Crea la CPU y su memoria con el programa y los segmentos de datos cargados."""
+    cpu = CPU(io, codificacion)
+    mem = Memoria()
+    # La carga va directa a la memoria, antes de intercalar envolturas: no
+    # es un acceso del programa (ni cuenta en la cache ni toca la E/S mapeada)
+    mem.cargar(base, instrs)
+    for direccion, palabras in datos or ():
+        mem.cargar(direccion, palabras)
+
+    if cache is not None:
+        # Por debajo de la E/S mapeada: los registros MMIO no se cachean
+        mem = cache.envolver(mem)
+    mem = cpu.io.envolver_memoria(mem)
+
+    cpu.PC = base
+    cpu.mem = mem
+    return cpu, mem
+
+def cargar_programa(instrs, base=0x0, io=None, codificacion=None, datos=None, cache=None):
+    """
+    Prepara una CPU con el programa cargado sin ejecutarlo, para controlarla
+    con cpu.step / cpu.run_until y los breakpoints y watchpoints.
+    cache: JerarquiaCache opcional, como en run_instructions.
+    """
+    codificacion, instrs = detectar_codificacion(instrs, codificacion)
+    cpu, _ = _preparar(instrs, base, io, codificacion, datos, cache)
+    return cpu
+
+def run_instructions(instrs, base=0x0, io=None, codificacion=None, fusion=False, datos=None,
+                     max_pasos=None, perfil=None, cache=None):
+    """
+    Carga instrs en memoria a partir de base y ejecuta hasta HALT.
+    io: DispositivosES opcional (por defecto consola + salida con buffer).
+    codificacion: CODIF_VARIABLE o CODIF_FIJA64; si es None se detecta por cabecera.
+    fusion: si es True se ejecutan pares frecuentes como superinstrucciones;
+    el informe queda en cpu.informe_fusion.
+    datos: segmentos [(direccion, [palabras])] de assemble_program, que se
+    cargan en bloque antes de empezar.
+    max_pasos: si se indica, lanza LimiteExcedido al superar ese numero de
+    despachos (una superinstruccion cuenta como uno).
+    perfil: ExecutionProfile (sourcemap.py) que acumula ejecuciones y tiempo
+    por PC; mientras se perfila no se aplica la fusion, para poder atribuir
+    cada instruccion a su linea.
+    cache: JerarquiaCache (cache.py) que se intercala entre la CPU y la
+    memoria para contar aciertos, fallos y ciclos de cada acceso, incluida
+    la lectura de cada instruccion. Tampoco se aplica la fusion, cuya
+    deteccion y comprobaciones anadirian lecturas que el programa no hace.
+    """
+    codificacion, instrs = detectar_codificacion(instrs, codificacion)
+    cpu, mem = _preparar(instrs, base, io, codificacion, datos, cache)
+
+    try:
+        if perfil is not None:
+            _run_perfilado(cpu, mem, perfil, max_pasos)
+        elif fusion and cache is None:
+            _run_fusionado(cpu, mem, base, len(instrs), max_pasos)
+        elif max_pasos is not None:
+            _run_limitado(cpu, mem, max_pasos)
+        elif codificacion == CODIF_FIJA64:
+            tabla = cpu.instrucciones.tabla
+            while cpu.running:
+                instr = mem.leer(cpu.PC)
+                tabla[instr >> 56](instr)
+                if cpu.running:
+                    cpu.PC += 1
+        else:
+            while cpu.running:
+                instr = mem.leer(cpu.PC)
+                cpu.ejecutar(instr, mem)
+                if cpu.running:
+                    cpu.PC += 1
+    finally:
+        cpu.io.flush()
+
+    return cpu, mem
+
+async def run_instructions_async(instrs, base=0x0, io=None, codificacion=None, datos=None,
+                                 max_pasos=None, rebanada=2000, rebanada_ms=None):
+    """
+    Variante cooperativa de run_instructions para asyncio.
+    Ejecuta en rebanadas de 'rebanada' instrucciones y entre una y otra cede
+    el bucle de eventos, de modo que muchas simulaciones pueden compartirlo
+    por turnos. Con rebanada_ms la rebanada termina ademas al superar ese
+    tiempo (se comprueba cada 256 instrucciones).
+    La cancelacion de la tarea detiene la simulacion en el siguiente punto
+    de cesion (CancelledError).
+    E/S: si INPUT u OUTPUT encuentran la cola vacia o llena (EntradaPendiente,
+    SalidaPendiente de dispositivos.py) se espera al dispositivo sin bloquear
+    el bucle y se reintenta la misma instruccion.
+    """
+    from dispositivos import EntradaPendiente, SalidaPendiente
+
+    codificacion, instrs = detectar_codificacion(instrs, codificacion)
+    cpu, mem = _preparar(instrs, base, io, codificacion, datos)
+    ejecutar = _despachador(cpu)
+    leer = mem.leer
+    reloj = time.perf_counter
+    lote = rebanada if rebanada_ms is None else min(rebanada, 256)
+    pasos = 0
+    try:
+        while cpu.running:
+            if max_pasos is not None and pasos >= max_pasos:
+                raise LimiteExcedido(f"Limite de {max_pasos} instrucciones excedido (PC={cpu.PC})")
+            limite = rebanada if max_pasos is None else min(rebanada, max_pasos - pasos)
+            fin = reloj() + rebanada_ms / 1000 if rebanada_ms is not None else None
+            hechos = 0
+            try:
+                while cpu.running and hechos < limite:
+                    tope = min(hechos + lote, limite)
+                    while cpu.running and hechos < tope:
+                        ejecutar(leer(cpu.PC))
+                        hechos += 1
+                        if cpu.running:
+                            cpu.PC += 1
+                    if fin is not None and reloj() >= fin:
+                        break
+            except (EntradaPendiente, SalidaPendiente) as e:
+                # La instruccion no se completo: PC sigue apuntando a ella
+                pasos += hechos
+                await cpu.io.esperar(e)
+                continue
+            pasos += hechos
+            await asyncio.sleep(0)
+    finally:
+        cpu.io.flush()
+
     return cpu, mem
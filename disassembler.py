@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Disassembler for the Simulated CPU
+
+Inverts the assembler's INSTR table. Whole programs are decoded at once
+with NumPy (both encodings; in the variable encoding the width of each
+word is resolved by trying every instruction width), producing labeled
+listings that round-trip through assemble_lines, plus an opcode histogram.
+"""
+
+import sys
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # sin NumPy se usa el decodificador escalar
+    np = None
+
+from assembler import INSTR, OPERANDS, variable_width
+from cpu_core import detectar_codificacion
+from instrucciones import CODIF_VARIABLE, CODIF_FIJA64, MASK46
+
+# Mnemonicos indexados por id; el id -1 marca una palabra no decodificable
+MNEMONICS = list(INSTR)
+_MNEM_ID = {m: i for i, m in enumerate(MNEMONICS)}
+_WIDTHS = sorted({variable_width(m) for m in MNEMONICS})
+
+
+def _build_lookup(mnems):
+    """Tabla de 1024 entradas (opcode << 2 | modo) -> id de mnemonico."""
+    table = [-1] * 1024
+    for m in mnems:
+        code, mode = INSTR[m]['code'], INSTR[m]['mode']
+        modes = range(4) if mode is None else (mode,)
+        for md in modes:
+            idx = (code << 2) | md
+            if table[idx] != -1 and mode is not None:
+                raise ValueError(f"Codificacion ambigua: {m} y {MNEMONICS[table[idx]]}")
+            table[idx] = _MNEM_ID[m]
+    return table
+
+# Una tabla por ancho en la codificacion variable y una para la fija
+_LOOKUP_VAR = {w: _build_lookup([m for m in MNEMONICS if variable_width(m) == w]) for w in _WIDTHS}
+_LOOKUP_FIXED = _build_lookup(MNEMONICS)
+
+
+def _signed(val, bits):
+    return val - (1 << bits) if val & (1 << (bits - 1)) else val
+
+
+def _variable_fields(mnem, w):
+    syntax, imm_bits = OPERANDS[mnem], INSTR[mnem]['imm_bits']
+    if syntax == 'r':
+        return w & 0xF, 0, 0
+    if syntax in ('r_', 'rr'):
+        return (w >> 4) & 0xF, w & 0xF, 0
+    if syntax == 'rrr':
+        return (w >> 8) & 0xF, (w >> 4) & 0xF, w & 0xF
+    if syntax == 'rrrr':
+        return (w >> 12) & 0xF, (w >> 8) & 0xF, w & 0xFF
+    if syntax == 'ri':
+        imm = w & ((1 << imm_bits) - 1)
+        if INSTR[mnem]['mode'] == 1:
+            imm = _signed(imm, imm_bits)
+        return (w >> imm_bits) & 0xF, 0, imm
+    if syntax == 'rri':
+        return (w >> (imm_bits + 4)) & 0xF, (w >> imm_bits) & 0xF, _signed(w & ((1 << imm_bits) - 1), imm_bits)
+    if syntax in ('i', 'k'):
+        return 0, 0, w & ((1 << imm_bits) - 1)
+    return 0, 0, 0
+
+
+def decode_word(w, encoding=CODIF_VARIABLE):
+    """
+    Decodifica una palabra a (mnemonico, r1, r2, imm) o None si no es valida.
+    Los inmediatos de modo 1 se devuelven con signo.
+    """
+    if encoding == CODIF_FIJA64:
+        mid = _LOOKUP_FIXED[((w >> 56) << 2) | ((w >> 54) & 0x3)] if w >> 64 == 0 else -1
+        if mid < 0:
+            return None
+        mnem = MNEMONICS[mid]
+        imm = w & MASK46
+        if INSTR[mnem]['mode'] == 1:
+            imm = _signed(imm, 46)
+        return mnem, (w >> 50) & 0xF, (w >> 46) & 0xF, imm
+    for width in _WIDTHS:
+        if w >> width:
+            continue
+        modebits = (w >> (width - 10)) & 0x3 if width >= 10 else 0
+        mid = _LOOKUP_VAR[width][((w >> (width - 8)) << 2) | modebits]
+        if mid >= 0:
+            mnem = MNEMONICS[mid]
+            return (mnem,) + _variable_fields(mnem, w)
+    return None
+
+
+def decode_words(words, encoding=CODIF_VARIABLE):
+    """
+    Decodifica un programa completo. Devuelve cuatro secuencias paralelas
+    (ids de mnemonico, r1, r2, imm); id -1 indica palabra no decodificable.
+    """
+    if np is None:
+        ids, r1s, r2s, imms = [], [], [], []
+        for w in words:
+            d = decode_word(w, encoding)
+            if d is None:
+                d = (None, 0, 0, 0)
+            ids.append(_MNEM_ID.get(d[0], -1))
+            r1s.append(d[1]); r2s.append(d[2]); imms.append(d[3])
+        return ids, r1s, r2s, imms
+
+    w = np.asarray(words, dtype=np.uint64)
+    u = np.uint64
+    if encoding == CODIF_FIJA64:
+        key = ((w >> u(56)) << u(2)) | ((w >> u(54)) & u(3))
+        ids = np.asarray(_LOOKUP_FIXED, dtype=np.int64)[key.astype(np.int64)]
+        r1 = ((w >> u(50)) & u(0xF)).astype(np.int64)
+        r2 = ((w >> u(46)) & u(0xF)).astype(np.int64)
+        imm = (w & u(MASK46)).astype(np.int64)
+        signed = np.zeros(len(MNEMONICS) + 1, dtype=bool)
+        for m in MNEMONICS:
+            signed[_MNEM_ID[m]] = INSTR[m]['mode'] == 1
+        neg = signed[ids] & (imm >= (1 << 45))
+        imm[neg] -= (1 << 46)
+        return ids, r1, r2, imm
+
+    # Codificacion variable: probar los anchos de menor a mayor
+    ids = np.full(len(w), -1, dtype=np.int64)
+    for width in _WIDTHS:
+        pending = (ids < 0) & ((w >> u(width)) == 0)
+        if not pending.any():
+            continue
+        key = (w >> u(width - 8)) << u(2)
+        if width >= 10:
+            key |= (w >> u(width - 10)) & u(3)
+        # Las palabras que no caben en este ancho pueden dar claves fuera de rango
+        key = np.where(pending, key, 0).astype(np.int64)
+        found = np.asarray(_LOOKUP_VAR[width], dtype=np.int64)[key]
+        sel = pending & (found >= 0)
+        ids[sel] = found[sel]
+
+    r1 = np.zeros(len(w), dtype=np.int64)
+    r2 = np.zeros(len(w), dtype=np.int64)
+    imm = np.zeros(len(w), dtype=np.int64)
+    wi = w.astype(np.int64)  # los anchos variables caben en 63 bits
+    for m in MNEMONICS:
+        sel = ids == _MNEM_ID[m]
+        if not sel.any():
+            continue
+        syntax, imm_bits = OPERANDS[m], INSTR[m]['imm_bits']
+        ws = wi[sel]
+        if syntax == 'r':
+            r1[sel] = ws & 0xF
+        elif syntax in ('r_', 'rr'):
+            r1[sel] = (ws >> 4) & 0xF
+            r2[sel] = ws & 0xF
+        elif syntax == 'rrr':
+            r1[sel] = (ws >> 8) & 0xF
+            r2[sel] = (ws >> 4) & 0xF
+            imm[sel] = ws & 0xF
+        elif syntax == 'rrrr':
+            r1[sel] = (ws >> 12) & 0xF
+            r2[sel] = (ws >> 8) & 0xF
+            imm[sel] = ws & 0xFF
+        elif syntax == 'ri':
+            val = ws & ((1 << imm_bits) - 1)
+            if INSTR[m]['mode'] == 1:
+                val = np.where(val >= (1 << (imm_bits - 1)), val - (1 << imm_bits), val)
+            r1[sel] = (ws >> imm_bits) & 0xF
+            imm[sel] = val
+        elif syntax == 'rri':
+            val = ws & ((1 << imm_bits) - 1)
+            r1[sel] = (ws >> (imm_bits + 4)) & 0xF
+            r2[sel] = (ws >> imm_bits) & 0xF
+            imm[sel] = np.where(val >= (1 << (imm_bits - 1)), val - (1 << imm_bits), val)
+        elif syntax in ('i', 'k'):
+            imm[sel] = ws & ((1 << imm_bits) - 1)
+    return ids, r1, r2, imm
+
+
+def _tolist(seq):
+    return seq.tolist() if hasattr(seq, 'tolist') else list(seq)
+
+
+def disassemble(words, encoding=None, labels=True):
+    """
+    Devuelve el listado en ensamblador de un programa. Si encoding es None
+    se detecta por la cabecera MAGIC_FIJA64. Los destinos de saltos y
+    llamadas dentro del programa se sustituyen por etiquetas Lxxxx.
+    """
+    encoding, words = detectar_codificacion(words, encoding)
+    ids, r1s, r2s, imms = (_tolist(a) for a in decode_words(words, encoding))
+    n = len(words)
+
+    targets = {}
+    if labels:
+        for mid, imm in zip(ids, imms):
+            if mid >= 0 and OPERANDS[MNEMONICS[mid]] == 'i' and 0 <= imm <= n:
+                targets[imm] = f"L{imm:04X}"
+
+    out = []
+    for addr, (mid, r1, r2, imm) in enumerate(zip(ids, r1s, r2s, imms)):
+        if addr in targets:
+            out.append(f"{targets[addr]}:")
+        if mid < 0:
+            out.append(f"; 0x{words[addr]:X} (palabra no decodificable)")
+            continue
+        mnem = MNEMONICS[mid]
+        syntax = OPERANDS[mnem]
+        if syntax == 'none':
+            out.append(mnem)
+        elif syntax in ('r', 'r_'):
+            out.append(f"{mnem} R{r1}")
+        elif syntax == 'rr':
+            out.append(f"{mnem} R{r1}, R{r2}")
+        elif syntax == 'rrr':
+            out.append(f"{mnem} R{r1}, R{r2}, R{imm}")
+        elif syntax == 'rrrr':
+            out.append(f"{mnem} R{r1}, R{r2}, R{imm >> 4}, R{imm & 0xF}")
+        elif syntax == 'ri':
+            val = f"0x{imm:X}" if INSTR[mnem]['mode'] == 2 else str(imm)
+            out.append(f"{mnem} R{r1}, {val}")
+        elif syntax == 'rri':
+            out.append(f"{mnem} R{r1}, R{r2}, {imm}")
+        elif syntax == 'k':
+            out.append(f"{mnem} {imm:#x}")
+        else:
+            out.append(f"{mnem} {targets.get(imm, hex(imm))}")
+    if n in targets:
+        out.append(f"{targets[n]}:")
+    return out
+
+
+def opcode_histogram(words, encoding=None):
+    """Cuenta de instrucciones por mnemonico (las no decodificables como '???')."""
+    encoding, words = detectar_codificacion(words, encoding)
+    ids = decode_words(words, encoding)[0]
+    if np is not None:
+        counts = np.bincount(np.asarray(ids) + 1, minlength=len(MNEMONICS) + 1)
+        hist = Counter({MNEMONICS[i - 1] if i else '???': int(c)
+                        for i, c in enumerate(counts) if c})
+    else:
+        hist = Counter(MNEMONICS[i] if i >= 0 else '???' for i in ids)
+    return hist
+
+
+def disassemble_file(path: str, encoding=None):
+    with open(path, 'r', encoding='utf-8') as f:
+        words = [int(tok, 0) for tok in f.read().split()]
+    return disassemble(words, encoding)
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if len(args) != 1:
+        print("Uso: python disassembler.py [--fixed64] [--hist] <archivo_binario>")
+        sys.exit(1)
+    enc = CODIF_FIJA64 if '--fixed64' in sys.argv else None
+    with open(args[0], 'r', encoding='utf-8') as f:
+        program = [int(tok, 0) for tok in f.read().split()]
+    if '--hist' in sys.argv:
+        for mnem, count in opcode_histogram(program, enc).most_common():
+            print(f"{mnem:8} {count}")
+    else:
+        for line in disassemble(program, enc):
+            print(line)
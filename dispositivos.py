@@ -0,0 +1,273 @@
+"""
+Dispositivos de E/S para la CPU simulada.
+
+Las instrucciones INPUT (0x90) y OUTPUT (0x91) delegan en el objeto
+``DispositivosES`` asociado a la CPU (``cpu.io``).  Este agrupa:
+
+- una fuente de entrada (consola, lista, archivo o cola),
+- un sumidero de salida con buffer que se vuelca por lotes,
+- opcionalmente, registros mapeados en memoria (MMIO) como alternativa
+  a los opcodes 0x90/0x91.
+"""
+import asyncio
+import queue
+import sys
+
+from instrucciones import MemoriaEnvuelta
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+# Direcciones por defecto de los registros mapeados en memoria
+MMIO_BASE = 0xFFF0
+MMIO_ENTRADA = 0   # leer -> siguiente valor de la entrada
+MMIO_SALIDA = 1    # escribir -> emite el valor por la salida
+MMIO_ESTADO = 2    # leer -> 1 si hay entrada disponible, 0 si no
+
+
+class EntradaAgotada(Exception):
+    """La fuente de entrada no tiene ms valores disponibles."""
+
+
+class EntradaPendiente(EntradaAgotada):
+    """La fuente de entrada est vaca por ahora, pero puede recibir ms valores."""
+
+
+class SalidaPendiente(Exception):
+    """El destino de la salida est lleno por ahora; el valor no se ha emitido."""
+
+
+# --- Fuentes de entrada ---------------------------------------------------
+
+class EntradaConsola:
+    """Entrada interactiva con ``input()`` (comportamiento original)."""
+    interactiva = True
+
+    def leer(self, r1=None):
+        prompt = f"Entrada R{r1}: " if r1 is not None else "Entrada: "
+        return int(input(prompt))
+
+    def disponible(self):
+        return True
+
+
+class EntradaLista:
+    """Entrada a partir de una secuencia de valores en memoria."""
+    interactiva = False
+
+    def __init__(self, valores):
+        self.valores = list(valores)
+        self.pos = 0
+
+    def leer(self, r1=None):
+        if self.pos >= len(self.valores):
+            raise EntradaAgotada("No quedan valores en la entrada")
+        val = self.valores[self.pos]
+        self.pos += 1
+        return int(val)
+
+    def disponible(self):
+        return self.pos < len(self.valores)
+
+
+class EntradaArchivo(EntradaLista):
+    """Entrada leda de un archivo de texto: enteros separados por espacios o lneas."""
+
+    def __init__(self, ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            super().__init__(int(tok, 0) for tok in f.read().split())
+
+
+# Pausas (s) entre sondeos de una queue.Queue durante la espera asincrona
+SONDEO_MIN = 0.001
+SONDEO_MAX = 0.05
+
+
+async def _sondear(intento):
+    """
+    Reintenta intento() (get_nowait / put_nowait de una queue.Queue) con
+    pausas crecientes. No ocupa hilos del ejecutor, asi que la cancelacion
+    de la tarea la detiene en la siguiente pausa.
+    """
+    pausa = SONDEO_MIN
+    while True:
+        try:
+            return intento()
+        except (queue.Empty, queue.Full):
+            await asyncio.sleep(pausa)
+            pausa = min(pausa * 2, SONDEO_MAX)
+
+
+class EntradaCola:
+    """
+    Entrada desde una cola (``queue.Queue`` o ``asyncio.Queue``).
+    Si la cola est vaca se lanza ``EntradaPendiente`` en lugar de bloquear;
+    la ejecucion asincrona espera entonces con ``esperar()``: sobre una
+    asyncio.Queue directamente y sobre una queue.Queue sondeandola.
+    """
+    interactiva = False
+    _VACIO = object()
+
+    def __init__(self, cola):
+        self.cola = cola
+        self._siguiente = self._VACIO  # valor ya recibido por esperar()
+
+    def leer(self, r1=None):
+        if self._siguiente is not self._VACIO:
+            val, self._siguiente = self._siguiente, self._VACIO
+            return int(val)
+        try:
+            return int(self.cola.get_nowait())
+        except (queue.Empty, asyncio.QueueEmpty):
+            raise EntradaPendiente("La cola de entrada est vaca") from None
+
+    def disponible(self):
+        return self._siguiente is not self._VACIO or not self.cola.empty()
+
+    async def esperar(self):
+        """Espera a que llegue un valor y lo reserva para el siguiente leer()."""
+        if self.disponible():
+            return
+        if isinstance(self.cola, asyncio.Queue):
+            self._siguiente = await self.cola.get()
+        else:
+            self._siguiente = await _sondear(self.cola.get_nowait)
+
+
+# --- Sumideros de salida --------------------------------------------------
+
+class SalidaBuffer:
+    """
+    Salida de texto con buffer. Acumula las lneas y las escribe por lotes
+    de ``tam_lote`` en ``destino`` (por defecto ``sys.stdout`` en el momento
+    del volcado, de modo que una redireccin de stdout sigue funcionando).
+    """
+
+    def __init__(self, destino=None, tam_lote=256):
+        self.destino = destino
+        self.tam_lote = tam_lote
+        self._pendientes = []
+
+    def escribir(self, r1, valor):
+        origen = f"R{r1}" if r1 is not None else "MMIO"
+        self._pendientes.append(f"Salida {origen}: {valor}\n")
+        if len(self._pendientes) >= self.tam_lote:
+            self.flush()
+
+    def flush(self):
+        if not self._pendientes:
+            return
+        destino = self.destino if self.destino is not None else sys.stdout
+        destino.write(''.join(self._pendientes))
+        self._pendientes.clear()
+
+
+class SalidaLista:
+    """Salida en memoria: guarda los valores emitidos sin formatearlos."""
+
+    def __init__(self):
+        self.valores = []
+
+    def escribir(self, r1, valor):
+        self.valores.append(valor)
+
+    def flush(self):
+        pass
+
+
+class SalidaCola:
+    """
+    Salida hacia una cola (``queue.Queue`` o ``asyncio.Queue``).
+    Si la cola tiene tamano maximo y esta llena se lanza ``SalidaPendiente``;
+    ``esperar()`` entrega el valor cuando hay sitio (sondeando si es una
+    queue.Queue) y el reintento de la instruccion ya no lo vuelve a emitir.
+    """
+
+    def __init__(self, cola):
+        self.cola = cola
+        self._pendiente = None
+        self._entregado = False
+
+    def escribir(self, r1, valor):
+        if self._entregado:
+            self._entregado = False
+            return
+        try:
+            self.cola.put_nowait(valor)
+        except (queue.Full, asyncio.QueueFull):
+            self._pendiente = valor
+            raise SalidaPendiente("La cola de salida est llena") from None
+
+    def flush(self):
+        pass
+
+    async def esperar(self):
+        if isinstance(self.cola, asyncio.Queue):
+            await self.cola.put(self._pendiente)
+        else:
+            await _sondear(lambda: self.cola.put_nowait(self._pendiente))
+        self._pendiente = None
+        self._entregado = True
+
+
+# --- Agrupacin de dispositivos -------------------------------------------
+
+class DispositivosES:
+    """Dispositivos de E/S conectados a una CPU."""
+
+    def __init__(self, entrada=None, salida=None, mmio_base=None):
+        self.entrada = entrada if entrada is not None else EntradaConsola()
+        self.salida = salida if salida is not None else SalidaBuffer()
+        # Si es None, no se mapean registros en memoria
+        self.mmio_base = mmio_base
+
+    def leer(self, r1=None):
+        # Antes de pedir datos al usuario, mostrar la salida pendiente
+        if getattr(self.entrada, 'interactiva', False):
+            self.salida.flush()
+        return self.entrada.leer(r1) & MASK64
+
+    def escribir(self, r1, valor):
+        self.salida.escribir(r1, valor)
+
+    def flush(self):
+        self.salida.flush()
+
+    async def esperar(self, pendiente):
+        """Espera a la entrada o a la salida segun la excepcion recibida."""
+        dispositivo = self.entrada if isinstance(pendiente, EntradaPendiente) else self.salida
+        esperar = getattr(dispositivo, 'esperar', None)
+        if esperar is None:
+            raise pendiente
+        await esperar()
+
+    def envolver_memoria(self, mem):
+        """Devuelve ``mem`` con los registros MMIO mapeados, si estn activos."""
+        if self.mmio_base is None:
+            return mem
+        return MemoriaES(mem, self, self.mmio_base)
+
+
+class MemoriaES(MemoriaEnvuelta):
+    """
+    Memoria con registros de dispositivo mapeados a partir de ``base``:
+    base+0 entrada, base+1 salida, base+2 estado de la entrada.
+    """
+
+    def __init__(self, interior, io, base=MMIO_BASE):
+        super().__init__(interior)
+        self.io = io
+        self.base = base
+
+    def leer(self, direccion):
+        desp = direccion - self.base
+        if desp == MMIO_ENTRADA:
+            return self.io.leer()
+        if desp == MMIO_ESTADO:
+            return 1 if self.io.entrada.disponible() else 0
+        return self.interior.leer(direccion)
+
+    def escribir(self, direccion, valor):
+        if direccion - self.base == MMIO_SALIDA:
+            self.io.escribir(None, valor)
+            return
+        self.interior.escribir(direccion, valor)
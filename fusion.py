@@ -0,0 +1,144 @@
+"""
+Fusion de superinstrucciones para el interprete.
+
+Antes de ejecutar se buscan en el programa cargado pares de instrucciones
+consecutivas frecuentes (lista estatica de patrones):
+
+- CMP/CMPI seguido de JZ/JNZ/JN/JNN
+- SUBI seguido de un salto condicional
+- LOADK seguido de una operacion ALU entre registros
+
+Cada par se pre-decodifica una vez y se ejecuta como un solo despacho que
+llama a los mismos metodos de ``Instrucciones`` que la ejecucion normal,
+por lo que el estado arquitectonico resultante es identico. Si el codigo
+se modifica en memoria, la fusion deja de aplicarse a ese par.
+"""
+from collections import Counter
+
+from instrucciones import CODIF_FIJA64, MASK46
+
+SALTOS_COND = {0xE1: 'JZ', 0xEE: 'JNZ', 0xE2: 'JN', 0xED: 'JNN'}
+ALU_REG = {0x81: 'ADD', 0x82: 'SUB', 0x83: 'MUL', 0x84: 'DIV', 0x8A: 'CMP',
+           0x11: 'AND', 0x13: 'OR', 0x12: 'XOR'}
+
+
+def _decodificar(instr, codificacion):
+    """
+    Extrae (opcode, modo, r1, r2, imm) igual que lo hace la CPU, o None si
+    la instruccion no es candidata. En los saltos el destino va en imm.
+    """
+    if codificacion == CODIF_FIJA64:
+        opcode = instr >> 56
+        if opcode in SALTOS_COND:
+            return opcode, None, 0, 0, instr & MASK46
+        modo = (instr >> 54) & 0x3
+        imm = instr & MASK46
+        if modo == 1 and imm & (1 << 45):
+            imm -= 1 << 46
+        return opcode, modo, (instr >> 50) & 0xF, (instr >> 46) & 0xF, imm
+
+    pos = instr.bit_length() or 8
+    opcode = instr >> (pos - 8)
+    if opcode in SALTOS_COND:
+        return opcode, None, 0, 0, instr & ((1 << (pos - 8)) - 1)
+    if pos < 18:
+        return None
+    shift = pos - 8
+    modo = (instr >> (shift - 2)) & 0x3
+    r1 = (instr >> (shift - 6)) & 0xF
+    r2 = (instr >> (shift - 10)) & 0xF
+    imm = instr & ((1 << (pos - 18)) - 1)
+    if modo == 1:
+        width = pos - 18
+        if imm & (1 << (width - 1)):
+            imm -= 1 << width
+    return opcode, modo, r1, r2, imm
+
+
+def _patron(a, b):
+    """Nombre del patron que forman dos instrucciones decodificadas, o None."""
+    op_a, modo_a = a[0], a[1]
+    op_b, modo_b = b[0], b[1]
+    if op_a == 0x8A and op_b in SALTOS_COND:
+        return f"{'CMPI' if modo_a == 1 else 'CMP'}+{SALTOS_COND[op_b]}"
+    if op_a == 0x82 and modo_a == 1 and op_b in SALTOS_COND:
+        return f"SUBI+{SALTOS_COND[op_b]}"
+    if op_a == 0xC2 and modo_a == 1 and op_b in ALU_REG and modo_b == 0:
+        return f"LOADK+{ALU_REG[op_b]}"
+    return None
+
+
+def _construir(ins, pc, a, b):
+    """Crea el manejador fusionado para el par (a, b) situado en pc."""
+    cpu = ins.cpu
+    _, modo_a, r1a, r2a, imm_a = a
+    op_b, modo_b, r1b, r2b, imm_b = b
+    siguiente = pc + 1
+
+    if op_b in SALTOS_COND:
+        primera = ins.comp if a[0] == 0x8A else ins.sub
+        salto = getattr(ins, SALTOS_COND[op_b].lower())
+        def fusionada():
+            primera(r1a, r2a, imm_a, modo_a)
+            cpu.PC = siguiente
+            salto(imm_b)
+        return fusionada
+
+    alu = {0x81: ins.add, 0x82: ins.sub, 0x83: ins.mul, 0x84: ins.div, 0x8A: ins.comp,
+           0x11: ins.and_op, 0x13: ins.or_op, 0x12: ins.xor_op}[op_b]
+    load = ins.load
+    def fusionada():
+        load(r1a, r2a, imm_a, modo_a)
+        cpu.PC = siguiente
+        alu(r1b, r2b, imm_b, modo_b)
+    return fusionada
+
+
+class InformeFusion:
+    """Fusiones detectadas y cuantas veces se ejecuto cada una."""
+
+    def __init__(self):
+        self.detectadas = {}        # pc -> nombre del patron
+        self.disparos = Counter()   # pc -> ejecuciones fusionadas
+
+    @property
+    def por_patron(self):
+        total = Counter()
+        for pc, n in self.disparos.items():
+            total[self.detectadas[pc]] += n
+        return total
+
+    @property
+    def despachos_ahorrados(self):
+        # Cada ejecucion fusionada evita un despacho completo
+        return sum(self.disparos.values())
+
+    def __str__(self):
+        lineas = [f"Fusiones detectadas: {len(self.detectadas)}"]
+        for nombre, n in self.por_patron.most_common():
+            lineas.append(f"  {nombre:12} {n}")
+        lineas.append(f"Despachos ahorrados: {self.despachos_ahorrados}")
+        return "\n".join(lineas)
+
+
+def detectar_fusiones(cpu, mem, base, n):
+    """
+    Busca pares fusionables en mem[base:base+n]. Devuelve (fusiones, informe)
+    donde fusiones es un diccionario pc -> (palabra1, palabra2, manejador).
+    """
+    ins = cpu.instrucciones
+    informe = InformeFusion()
+    fusiones = {}
+    decod = [_decodificar(mem.leer(base + i), cpu.codificacion) for i in range(n)]
+    i = 0
+    while i < n - 1:
+        a, b = decod[i], decod[i + 1]
+        nombre = _patron(a, b) if a and b else None
+        if nombre:
+            pc = base + i
+            fusiones[pc] = (mem.leer(pc), mem.leer(pc + 1), _construir(ins, pc, a, b))
+            informe.detectadas[pc] = nombre
+            i += 2
+        else:
+            i += 1
+    return fusiones, informe
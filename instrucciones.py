@@ -1,4 +1,24 @@
+import operator
+from contextlib import nullcontext
+
+try:
+    import numpy as np
+except ImportError:  # sin NumPy las instrucciones vectoriales usan listas
+    np = None
+
+# Codificaciones de instrucciones soportadas por la CPU
+CODIF_VARIABLE = 'variable'   # ancho variable, campos segun bit_length()
+CODIF_FIJA64 = 'fixed64'      # 64 bits fijos: opcode siempre en el byte alto
+# Palabra de cabecera que marca un binario en codificacion fija ("STRE64FX")
+MAGIC_FIJA64 = int.from_bytes(b'STRE64FX', 'big')
+MASK46 = (1 << 46) - 1
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
 class Memoria:
+    # Un solo hilo de ejecucion: las operaciones atomicas no necesitan cerrojo
+    bloqueo = nullcontext()
+
     def __init__(self):
         self.data = {}
 
@@ -8,15 +28,102 @@ class Memoria:
     def leer(self, direccion):
         return self.data.get(direccion, 0)
 
+    def cargar(self, direccion, valores):
+        """Escribe en bloque una secuencia de valores a partir de direccion."""
+        self.data.update(zip(range(direccion, direccion + len(valores)), valores))
+
+    def leer_bloque(self, direccion, n):
+        """Lee n valores consecutivos a partir de direccion."""
+        get = self.data.get
+        return [get(d, 0) for d in range(direccion, direccion + n)]
+
+
+class MemoriaEnvuelta:
+    """
+    Base para memorias que envuelven a otra (E/S mapeada, depuracion, etc.).
+    Por defecto delega todas las operaciones en la memoria interior.
+    """
+    def __init__(self, interior):
+        self.interior = interior
+
+    @property
+    def data(self):
+        return self.interior.data
+
+    @property
+    def bloqueo(self):
+        return self.interior.bloqueo
+
+    def escribir(self, direccion, valor):
+        self.interior.escribir(direccion, valor)
+
+    def leer(self, direccion):
+        return self.interior.leer(direccion)
 
+    def cargar(self, direccion, valores):
+        self.interior.cargar(direccion, valores)
+
+    def leer_bloque(self, direccion, n):
+        return self.interior.leer_bloque(direccion, n)
+
+
+class MemoriaVigilada(MemoriaEnvuelta):
+    """
+    Memoria con puntos de vigilancia de lectura y escritura. La CPU solo la
+    intercala mientras haya alguno (ver CPU.watch), asi que sin vigilancia
+    los accesos no pagan ninguna comprobacion.
+    """
+    def __init__(self, interior, cpu):
+        super().__init__(interior)
+        self.cpu = cpu
+        self.lecturas = set()
+        self.escrituras = set()
+
+    def leer(self, direccion):
+        valor = self.interior.leer(direccion)
+        if direccion in self.lecturas:
+            self.cpu._vigilancia('lectura', direccion, valor)
+        return valor
+
+    def escribir(self, direccion, valor):
+        if direccion in self.escrituras:
+            self.cpu._vigilancia('escritura', direccion, valor)
+        self.interior.escribir(direccion, valor)
+
+    def cargar(self, direccion, valores):
+        for d in self.escrituras:
+            if direccion <= d < direccion + len(valores):
+                self.cpu._vigilancia('escritura', d, valores[d - direccion])
+        self.interior.cargar(direccion, valores)
+
+    def leer_bloque(self, direccion, n):
+        valores = self.interior.leer_bloque(direccion, n)
+        for d in self.lecturas:
+            if direccion <= d < direccion + n:
+                self.cpu._vigilancia('lectura', d, valores[d - direccion])
+        return valores
+
+
 class CPU:
-    def __init__(self):
+    def __init__(self, io=None, codificacion=CODIF_VARIABLE):
         self.reg = [0] * 16  # 16 registros
         self.mem = Memoria()  # memoria integrada
         self.FLAGS = {'Z': 0, 'N': 0}
         self.PC = 0
         self.running = True
+        self.id = 0  # identificador de nucleo (ver multinucleo.py)
+        if io is None:
+            from dispositivos import DispositivosES  # evita importacion circular
+            io = DispositivosES()
+        self.io = io  # dispositivos de E/S (INPUT/OUTPUT)
+        from servicios import tabla_por_defecto
+        self.interrupciones = tabla_por_defecto()  # vectores de INT (servicios.py)
+        self.codificacion = codificacion
         self.instrucciones = Instrucciones(self)
+        # Depuracion (step/run_until): sin puntos activos no cuesta nada
+        self.breakpoints = set()
+        self.parada = None     # motivo de la ultima parada por vigilancia
+        self._vigilada = None  # MemoriaVigilada intercalada, si hay vigilancia
 
     def ejecutar(self, instruccion, memoria_externa=None):
         """
@@ -26,6 +133,10 @@ class CPU:
         if memoria_externa:
             self.mem = memoria_externa
 
+        if self.codificacion == CODIF_FIJA64:
+            # Despacho directo: el opcode es siempre el byte alto
+            return self.instrucciones.tabla[instruccion >> 56](instruccion)
+
         bit_length = instruccion.bit_length()
         if bit_length == 0:
             # Para instrucciones como NOP (0x00) cuyo bit_length es 0,
@@ -33,12 +144,188 @@ class CPU:
             bit_length = 8
 
         self.instrucciones.ejecutar(instruccion, bit_length)
+
+    # --- Depuracion ------------------------------------------------------
+
+    def _ejecutor(self):
+        if self.codificacion == CODIF_FIJA64:
+            tabla = self.instrucciones.tabla
+            return lambda instr: tabla[instr >> 56](instr)
+        return self.ejecutar
+
+    def add_breakpoint(self, pc):
+        self.breakpoints.add(pc)
+
+    def remove_breakpoint(self, pc):
+        self.breakpoints.discard(pc)
+
+    def watch(self, direccion, lectura=False, escritura=True):
+        """Detiene step/run_until tras la instruccion que accede a direccion."""
+        if self._vigilada is None:
+            self._vigilada = MemoriaVigilada(self.mem, self)
+            self.mem = self._vigilada
+        if lectura:
+            self._vigilada.lecturas.add(direccion)
+        if escritura:
+            self._vigilada.escrituras.add(direccion)
+
+    def unwatch(self, direccion):
+        v = self._vigilada
+        if v is None:
+            return
+        v.lecturas.discard(direccion)
+        v.escrituras.discard(direccion)
+        if not v.lecturas and not v.escrituras:
+            # Sin vigilancia se retira el envoltorio: accesos sin coste extra
+            self.mem = v.interior
+            self._vigilada = None
+
+    def _vigilancia(self, tipo, direccion, valor):
+        self.parada = ('watchpoint', tipo, direccion, valor, self.PC)
+
+    def step(self, n=1):
+        """
+        Ejecuta hasta n instrucciones, ignorando los breakpoints. Se detiene
+        antes en HALT o al saltar un watchpoint. Devuelve las ejecutadas.
+        """
+        ejecutar = self._ejecutor()
+        leer = self._vigilada.interior.leer if self._vigilada else self.mem.leer
+        self.parada = None
+        hechos = 0
+        while self.running and hechos < n:
+            ejecutar(leer(self.PC))
+            hechos += 1
+            if self.running:
+                self.PC += 1
+            if self.parada:
+                break
+        return hechos
+
+    def run_until(self, objetivo=None, max_pasos=None):
+        """
+        Ejecuta hasta HALT, un breakpoint, un watchpoint o el objetivo:
+        un PC (parada antes de ejecutarlo) o un predicado f(cpu) evaluado
+        antes de cada instruccion. La instruccion actual se ejecuta siempre,
+        de modo que se puede continuar desde una parada.
+        Devuelve 'halt', 'breakpoint', 'watchpoint', 'objetivo' o 'limite'.
+        """
+        predicado = objetivo if callable(objetivo) else None
+        paradas = set(self.breakpoints)
+        if objetivo is not None and predicado is None:
+            paradas.add(objetivo)
+        ejecutar = self._ejecutor()
+        # La busqueda de instrucciones no dispara los watchpoints de lectura
+        leer = self._vigilada.interior.leer if self._vigilada else self.mem.leer
+        self.parada = None
+
+        if not paradas and predicado is None and self._vigilada is None and max_pasos is None:
+            # Nada que comprobar: el mismo bucle que run_instructions
+            while self.running:
+                ejecutar(leer(self.PC))
+                if self.running:
+                    self.PC += 1
+            return 'halt'
+
+        pasos = 0
+        while self.running:
+            if pasos:
+                if self.PC in paradas:
+                    return 'objetivo' if self.PC == objetivo else 'breakpoint'
+                if predicado is not None and predicado(self):
+                    return 'objetivo'
+            if pasos == max_pasos:
+                return 'limite'
+            ejecutar(leer(self.PC))
+            pasos += 1
+            if self.running:
+                self.PC += 1
+            if self.parada:
+                return 'watchpoint'
+        return 'halt'
 
 class Instrucciones:
     def __init__(self, cpu):
         self.cpu = cpu
         self.MASK56 = (1 << 56) - 1
         self.MASK46 = (1 << 46) - 1
+        self.tabla = self._construir_tabla()
+
+    # --- Codificacion fija de 64 bits ------------------------------------
+    # opcode(8) | modo(2) | r1(4) | r2(4) | inmediato(46)
+
+    def _construir_tabla(self):
+        """Tabla de 256 manejadores indexada por opcode (codificacion fija)."""
+        M46 = self.MASK46
+        SIGNO = 1 << 45
+
+        def campos(w):
+            modo = (w >> 54) & 0x3
+            imm = w & M46
+            if modo == 1 and imm & SIGNO:
+                imm -= 1 << 46
+            return (w >> 50) & 0xF, (w >> 46) & 0xF, imm, modo
+
+        def sin_args(f):   return lambda w: f()
+        def salto(f):      return lambda w: f(w & M46)
+        def un_reg(f):     return lambda w: f((w >> 50) & 0xF)
+        def dos_regs(f):   return lambda w: f((w >> 50) & 0xF, (w >> 46) & 0xF)
+        def alu(f):
+            def h(w):
+                r1, r2, imm, modo = campos(w)
+                f(r1, r2, imm, modo)
+            return h
+        def regs_imm(f):
+            def h(w):
+                r1, r2, imm, _ = campos(w)
+                f(r1, r2, imm)
+            return h
+        def cuatro_regs(f):
+            return lambda w: f((w >> 50) & 0xF, (w >> 46) & 0xF, (w >> 4) & 0xF, w & 0xF)
+
+        def load(w):
+            r1, r2, imm, modo = campos(w)
+            if modo == 3:
+                return self.load_indirect(r1, self.cpu.reg[r2] + imm)
+            return self.load(r1, r2, imm, modo)
+
+        def store(w):
+            r1, r2, imm, modo = campos(w)
+            if modo == 3:
+                return self.store_indirect(r1, self.cpu.reg[r2] + imm)
+            return self.store_direct(r1, imm)
+
+        def no_implementada(w):
+            print(f"Instruccin no implementada: {hex(w >> 56)}")
+            self.cpu.running = False
+
+        t = [no_implementada] * 256
+        t[0x00] = sin_args(self.nop)
+        t[0xFF] = sin_args(self.halt)
+        for op, f in ((0xE0, self.jmp), (0xE1, self.jz), (0xEE, self.jnz),
+                      (0xE2, self.jn), (0xED, self.jnn), (0xD8, self.call)):
+            t[op] = salto(f)
+        t[0xC2] = load
+        t[0xC3] = store
+        for op, f in ((0x81, self.add), (0x82, self.sub), (0x83, self.mul),
+                      (0x84, self.div), (0x8A, self.comp),
+                      (0x11, self.and_op), (0x13, self.or_op), (0x12, self.xor_op)):
+            t[op] = alu(f)
+        for op, f in ((0x10, self.not_op), (0x90, self.input), (0x91, self.output),
+                      (0xD0, self.push), (0xD1, self.pop),
+                      (0x48, self.inc), (0x49, self.dec), (0xA2, self.cpuid)):
+            t[op] = un_reg(f)
+        t[0x21] = dos_regs(self.test)
+        t[0xA1] = dos_regs(self.fetch_add)
+        for op, f in ((0x28, self.shl), (0x29, self.shr), (0xA0, self.cas),
+                      (0xB3, self.vsum), (0xB5, self.vmov), (0xB8, self.mmul)):
+            t[op] = regs_imm(f)
+        for op, f in ((0xB0, self.vadd), (0xB1, self.vsub), (0xB2, self.vmul),
+                      (0xB4, self.vdot)):
+            t[op] = cuatro_regs(f)
+        t[0xD9] = sin_args(self.ret)
+        t[0xF0] = salto(self.interrupt)
+        t[0xF1] = sin_args(self.return_interrupt)
+        return t
 
     def to_signed(self, val: int, bits: int = 64) -> int:
         """Interpreta val como signed twos-complement de bits bits."""
@@ -58,6 +345,10 @@ class Instrucciones:
             return self.nop()
         if opcode == 0xFF:
             return self.halt()
+
+        # INT n: opcode + numero de vector (sin operando, vector 0)
+        if opcode == 0xF0:
+            return self.interrupt(instr & ((1 << (pos - 8)) - 1))
 
         # Saltos / llamadas: opcode + inmediato
         if opcode in (0xE0, 0xE1, 0xEE, 0xE2, 0xED, 0xD8):
@@ -148,6 +439,20 @@ class Instrucciones:
             case 0x90:  self.input(r1)
             case 0x91:  self.output(r1)
 
+            # Sincronizacion entre nucleos
+            case 0xA0:  self.cas(r1, r2, imm)
+            case 0xA1:  self.fetch_add(r1, r2)
+            case 0xA2:  self.cpuid(r1)
+
+            # Vectoriales (imm: tercer registro, o tercero y cuarto)
+            case 0xB0:  self.vadd(r1, r2, imm >> 4, imm & 0xF)
+            case 0xB1:  self.vsub(r1, r2, imm >> 4, imm & 0xF)
+            case 0xB2:  self.vmul(r1, r2, imm >> 4, imm & 0xF)
+            case 0xB3:  self.vsum(r1, r2, imm)
+            case 0xB4:  self.vdot(r1, r2, imm >> 4, imm & 0xF)
+            case 0xB5:  self.vmov(r1, r2, imm)
+            case 0xB8:  self.mmul(r1, r2, imm)
+
             # Stack
             case 0xD0:  self.push(r1)
             case 0xD1:  self.pop(r1)
@@ -211,10 +516,95 @@ class Instrucciones:
     def not_op(self, r1): res=(~self.cpu.reg[r1])&0xFFFFFFFFFFFFFFFF;self.cpu.reg[r1]=res;self.set_flags(res)
     def test(self, r1, r2): res=self.cpu.reg[r1]&self.cpu.reg[r2];self.set_flags(res)
 
-    # E/S
-    def input(self, r1): self.cpu.reg[r1]=int(input(f"Entrada R{r1}: "))&0xFFFFFFFFFFFFFFFF
-    def output(self, r1): print(f"Salida R{r1}: {self.cpu.reg[r1]}")
-
+    # E/S (delegada en los dispositivos de la CPU, ver dispositivos.py)
+    def input(self, r1): self.cpu.reg[r1]=self.cpu.io.leer(r1)
+    def output(self, r1): self.cpu.io.escribir(r1, self.cpu.reg[r1])
+
+    # Atomicas: addr = R[r2]
+    def cas(self, r1, r2, r3):
+        """Si mem[addr]==R[r1] escribe R[r3] y Z=1; si no, R[r1]=mem[addr] y Z=0."""
+        addr = self.cpu.reg[r2]
+        with self.cpu.mem.bloqueo:
+            actual = self.cpu.mem.leer(addr)
+            if actual == self.cpu.reg[r1]:
+                self.cpu.mem.escribir(addr, self.cpu.reg[r3])
+                self.cpu.FLAGS['Z'] = 1
+            else:
+                self.cpu.reg[r1] = actual
+                self.cpu.FLAGS['Z'] = 0
+
+    def fetch_add(self, r1, r2):
+        """mem[addr] += R[r1]; R[r1] recibe el valor anterior."""
+        addr = self.cpu.reg[r2]
+        with self.cpu.mem.bloqueo:
+            anterior = self.cpu.mem.leer(addr)
+            self.cpu.mem.escribir(addr, (anterior + self.cpu.reg[r1]) & 0xFFFFFFFFFFFFFFFF)
+        self.cpu.reg[r1] = anterior
+
+    def cpuid(self, r1): self.cpu.reg[r1] = self.cpu.id
+
+    # Vectoriales: operan sobre rangos contiguos de memoria cuyas direcciones
+    # y longitud estan en registros. Las matrices llevan delante su cabecera
+    # (filas en addr-2, columnas en addr-1), ver parser_2.py.
+    def _vector(self, addr, n):
+        vals = self.cpu.mem.leer_bloque(addr, n)
+        if np is None:
+            return [v & MASK64 for v in vals]
+        try:
+            return np.array(vals, dtype=np.uint64)
+        except OverflowError:  # valores negativos cargados con LOADK
+            return np.array([v & MASK64 for v in vals], dtype=np.uint64)
+
+    def _vector_op(self, rd, ra, rb, rn, op):
+        n = self.cpu.reg[rn]
+        a = self._vector(self.cpu.reg[ra], n)
+        b = self._vector(self.cpu.reg[rb], n)
+        if np is None:
+            res = [op(x, y) & MASK64 for x, y in zip(a, b)]
+        else:
+            res = op(a, b).tolist()
+        self.cpu.mem.cargar(self.cpu.reg[rd], res)
+
+    def vadd(self, rd, ra, rb, rn): self._vector_op(rd, ra, rb, rn, operator.add)
+    def vsub(self, rd, ra, rb, rn): self._vector_op(rd, ra, rb, rn, operator.sub)
+    def vmul(self, rd, ra, rb, rn): self._vector_op(rd, ra, rb, rn, operator.mul)
+
+    def vmov(self, rd, ra, rn):
+        self.cpu.mem.cargar(self.cpu.reg[rd], self.cpu.mem.leer_bloque(self.cpu.reg[ra], self.cpu.reg[rn]))
+
+    def vsum(self, rd, ra, rn):
+        a = self._vector(self.cpu.reg[ra], self.cpu.reg[rn])
+        res = (sum(a) if np is None else int(a.sum())) & MASK64
+        self.cpu.reg[rd] = res
+        self.set_flags(res)
+
+    def vdot(self, rd, ra, rb, rn):
+        n = self.cpu.reg[rn]
+        a = self._vector(self.cpu.reg[ra], n)
+        b = self._vector(self.cpu.reg[rb], n)
+        res = (sum(x * y for x, y in zip(a, b)) if np is None else int(np.dot(a, b))) & MASK64
+        self.cpu.reg[rd] = res
+        self.set_flags(res)
+
+    def mmul(self, rd, ra, rb):
+        """Matriz en R[rd] = matriz en R[ra] x matriz en R[rb], con cabecera."""
+        mem = self.cpu.mem
+        pa, pb, pd = self.cpu.reg[ra], self.cpu.reg[rb], self.cpu.reg[rd]
+        filas, k = mem.leer(pa - 2), mem.leer(pa - 1)
+        kb, cols = mem.leer(pb - 2), mem.leer(pb - 1)
+        if k != kb:
+            print(f"Error: MMUL con dimensiones incompatibles ({filas}x{k} y {kb}x{cols})")
+            self.cpu.running = False
+            return
+        a = self._vector(pa, filas * k)
+        b = self._vector(pb, k * cols)
+        if np is None:
+            res = [sum(a[i * k + j] * b[j * cols + c] for j in range(k)) & MASK64
+                   for i in range(filas) for c in range(cols)]
+        else:
+            res = (a.reshape(filas, k) @ b.reshape(k, cols)).ravel().tolist()
+        mem.cargar(pd - 2, [filas, cols] + res)
+
     # Stack
     def push(self, r1): sp=15;self.cpu.reg[sp]=(self.cpu.reg[sp]-1)&0xFFFFFFFFFFFFFFFF;self.cpu.mem.escribir(self.cpu.reg[sp],self.cpu.reg[r1])
     def pop(self, r1):  sp=15;self.cpu.reg[r1]=self.cpu.mem.leer(self.cpu.reg[sp]);self.cpu.reg[sp]=(self.cpu.reg[sp]+1)&0xFFFFFFFFFFFFFFFF
@@ -256,7 +646,7 @@ class Instrucciones:
         self.cpu.reg[r1] = self.cpu.mem.leer(addr)
 
     # Interrupciones
-    def interrupt(self):sp=15;self.cpu.reg[sp]=(self.cpu.reg[sp]-1)&0xFFFFFFFFFFFFFFFF;self.cpu.mem.escribir(self.cpu.reg[sp],self.cpu.PC);self.cpu.PC=0x1000
+    def interrupt(self, n=0): self.cpu.interrupciones.atender(self.cpu, n)
     def return_interrupt(self):sp=15;self.cpu.PC=self.cpu.mem.leer(self.cpu.reg[sp]);self.cpu.reg[sp]=(self.cpu.reg[sp]+1)&0xFFFFFFFFFFFFFFFF
 
     def set_flags(self, result):
@@ -28,6 +28,7 @@ tokens = [
     'EQUALS',
     'LPAREN', 'RPAREN',
     'LBRACE', 'RBRACE',
+    'LBRACKET', 'RBRACKET', 'COMMA',
     'SEMICOLON',
 
     'LINE_COMMENT', 'BLOCK_COMMENT',
@@ -42,6 +43,9 @@ t_LPAREN         = r'\('
 t_RPAREN         = r'\)'
 t_LBRACE         = r'\{\{'
 t_RBRACE         = r'\}\}'
+t_LBRACKET       = r'\['
+t_RBRACKET       = r'\]'
+t_COMMA          = r','
 t_SEMICOLON      = r';'
 
 t_ignore = ' \t\r'
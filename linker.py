@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Linker for the Simulated CPU
+
+Combina modulos reubicables (assembler.assemble_object) en una imagen
+final: coloca el codigo de cada modulo a continuacion del anterior,
+resuelve los simbolos exportados (.global) e importados (.extern) y
+parchea los campos de inmediato indicados por las reubicaciones.
+
+build() anade compilacion incremental: cada modulo se guarda como objeto
+JSON en una cache indexada por el hash de su fuente, de modo que solo se
+reensamblan los modulos que han cambiado.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+
+from assembler import ObjectModule, assemble_object
+from instrucciones import CODIF_VARIABLE, CODIF_FIJA64, MAGIC_FIJA64
+
+# Cambiar si cambia el formato de ObjectModule para invalidar la cache
+OBJECT_VERSION = 1
+
+
+class LinkError(Exception):
+    pass
+
+
+def _patch(word, value, bits):
+    mask = (1 << bits) - 1
+    return (word & ~mask) | (value & mask)
+
+
+def link(objects, base=0, header=False, symbols=None):
+    """
+    Enlaza una lista de ObjectModule y devuelve (codigo, datos) con el
+    mismo formato que assemble_program. El primer modulo va primero, asi
+    que contiene el punto de entrada.
+    base: direccion de carga del codigo (la misma que se pase a
+    run_instructions).
+    symbols: diccionario opcional que recibe la direccion final de cada
+    simbolo exportado.
+    """
+    if not objects:
+        raise LinkError("No hay modulos que enlazar")
+    encoding = objects[0].encoding
+    for obj in objects:
+        if obj.encoding != encoding:
+            raise LinkError(f"Modulo '{obj.name}' con codificacion {obj.encoding}, se esperaba {encoding}")
+
+    # Disposicion del codigo y tabla global de simbolos
+    bases = []
+    table = {}
+    addr = base
+    for obj in objects:
+        bases.append(addr)
+        for name in obj.exports:
+            kind, val = obj.symbols[name]
+            if name in table:
+                raise LinkError(f"Simbolo '{name}' definido en '{table[name][1]}' y en '{obj.name}'")
+            table[name] = (addr + val if kind == 'code' else val, obj.name)
+        addr += len(obj.code)
+
+    # Los segmentos de datos son absolutos: no pueden solaparse entre modulos
+    spans = sorted((a, a + len(w), obj.name) for obj in objects for a, w in obj.data)
+    for (_, end, m1), (start, _, m2) in zip(spans, spans[1:]):
+        if start < end:
+            raise LinkError(f"Segmentos de datos solapados en 0x{start:X} ('{m1}' y '{m2}'); usar .org distintos")
+
+    code = []
+    data = []
+    for obj, mbase in zip(objects, bases):
+        words = list(obj.code)
+        segs = [(a, list(w)) for a, w in obj.data]
+        for seg, where, sym, addend, bits in obj.relocs:
+            if sym is None:
+                value = mbase + addend
+            elif sym in table:
+                value = table[sym][0] + addend
+            else:
+                raise LinkError(f"Simbolo no resuelto '{sym}' en el modulo '{obj.name}'")
+            if seg == 'code':
+                words[where] = _patch(words[where], value, bits)
+            else:
+                for a, w in segs:
+                    if a <= where < a + len(w):
+                        w[where - a] = _patch(w[where - a], value, bits)
+                        break
+        code.extend(words)
+        data.extend(segs)
+
+    if symbols is not None:
+        symbols.update({name: val for name, (val, _) in table.items()})
+    if header and encoding == CODIF_FIJA64:
+        code.insert(0, MAGIC_FIJA64)
+    print(f" Enlazados {len(objects)} modulos: {len(code)} palabras de codigo, {len(table)} simbolos globales")
+    return code, data
+
+
+def save_object(obj, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': OBJECT_VERSION, 'object': obj.to_dict()}, f)
+
+
+def load_object(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        d = json.load(f)
+    if d.get('version') != OBJECT_VERSION:
+        raise LinkError(f"Objeto '{path}' con version de formato distinta")
+    return ObjectModule.from_dict(d['object'])
+
+
+def _source_key(text, base_dir, encoding):
+    """Hash de la fuente, de la codificacion y de los archivos de .incbin."""
+    h = hashlib.sha256(f"{OBJECT_VERSION}:{encoding}:".encode())
+    h.update(text.encode('utf-8'))
+    for m in re.finditer(r'^\s*(?:\w+:\s*)?\.incbin\s+"?([^";\n]+?)"?\s*(?:;.*)?$', text, re.M | re.I):
+        path = m.group(1)
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def object_for(path, encoding=CODIF_VARIABLE, cache_dir=None):
+    """
+    Devuelve el ObjectModule de un archivo fuente, reutilizando el objeto
+    guardado en cache_dir si la fuente no ha cambiado.
+    """
+    path = os.path.abspath(path)
+    base_dir = os.path.dirname(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    name = os.path.splitext(os.path.basename(path))[0]
+    key = _source_key(text, base_dir, encoding)
+    cache_dir = cache_dir or os.path.join(base_dir, '.objcache')
+    # Un objeto por modulo y codificacion: cambiar de codificacion no
+    # invalida el objeto de la otra
+    cached = os.path.join(cache_dir, f"{name}.{key[:16]}.{encoding}.obj.json")
+    if os.path.isfile(cached):
+        print(f" Reutilizando objeto de '{name}'")
+        return load_object(cached)
+
+    print(f" Ensamblando modulo '{name}'")
+    obj = assemble_object(text.splitlines(), name, encoding, base_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Borrar versiones anteriores del mismo modulo en esta codificacion
+    stale = re.compile(re.escape(name) + r'\.[0-9a-f]{16}\.' + re.escape(encoding) + r'\.obj\.json')
+    for old in os.listdir(cache_dir):
+        if stale.fullmatch(old):
+            os.remove(os.path.join(cache_dir, old))
+    save_object(obj, cached)
+    return obj
+
+
+def build(paths, encoding=CODIF_VARIABLE, header=False, cache_dir=None, base=0):
+    """Ensambla (incrementalmente) y enlaza varios archivos fuente."""
+    objects = [object_for(p, encoding, cache_dir) for p in paths]
+    return link(objects, base, header)
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not args:
+        print("Uso: python linker.py [--fixed64] [--run] <modulo.asm> [<modulo.asm> ...]")
+        sys.exit(1)
+    enc = CODIF_FIJA64 if '--fixed64' in sys.argv else CODIF_VARIABLE
+    try:
+        binary, data = build(args, enc, header=enc == CODIF_FIJA64)
+    except (LinkError, ValueError) as e:
+        print(f" Error: {e}")
+        sys.exit(1)
+    if '--run' in sys.argv:
+        from cpu_core import run_instructions
+        cpu, _ = run_instructions(binary, datos=data)
+        for i, val in enumerate(cpu.reg):
+            print(f"   R{i}: {val}")
+    else:
+        for b in binary:
+            print(b)
@@ -1,15 +1,24 @@
 from compiler_frontend import compile_high_level_code
-from assembler import assemble_lines, preprocess_lines
+from assembler import assemble_program, preprocess_lines
 from cpu_core import run_instructions  # ya no hay importacin circular!
+from sourcemap import SourceMap, ExecutionProfile, hot_lines, format_report, folded_stacks
 
-def run_source_code(source_code: str):
+def build_source_code(source_code: str, smap=None):
+    """
+    Pasos 1 y 2: compila y ensambla. Devuelve (binario, datos) o None si
+    hubo un error (ya informado por pantalla).
+    """
     print(" Paso 1: Compilando lenguaje de alto nivel a ensamblador...")
     try:
-        asm_lines = compile_high_level_code(source_code)
-        bin_lines = assemble_lines(asm_lines)
+        asm_lines = compile_high_level_code(source_code, smap)
+        bin_lines, data = assemble_program(asm_lines)
     except Exception as e:
         print(f" Error durante compilacin: {e}")
         return
+    if not asm_lines:
+        # El error ya se informo; un programa vacio no terminaria nunca
+        print(" La compilacin no gener instrucciones.")
+        return
 
     print("\n Ensamblador generado:")
     for line in asm_lines:
@@ -19,14 +28,28 @@ def run_source_code(source_code: str):
     try:
 
         cleaned_asm = preprocess_lines(asm_lines)
-        bin_lines = assemble_lines(cleaned_asm)
+        bin_lines, data = assemble_program(cleaned_asm, source_map=smap)
     except Exception as e:
         print(f" Error durante ensamblado: {e}")
         return
+    return bin_lines, data
+
+def run_source_code(source_code: str, perfilar=False, flamegraph=None, cache=None):
+    """
+    perfilar: imprimir el informe de lineas calientes del fuente.
+    flamegraph: ruta donde escribir las pilas en formato "folded".
+    cache: JerarquiaCache (cache.py) cuyo informe se imprime al terminar.
+    """
+    smap = SourceMap(source_code) if (perfilar or flamegraph) else None
+    perfil = ExecutionProfile() if smap else None
+    programa = build_source_code(source_code, smap)
+    if programa is None:
+        return
+    bin_lines, data = programa
 
     print("\n Paso 3: Ejecutando en CPU simulada...")
     try:
-        cpu, mem = run_instructions(bin_lines)
+        cpu, mem = run_instructions(bin_lines, datos=data, perfil=perfil, cache=cache)
     except Exception as e:
         print(f" Error durante ejecucin: {e}")
         return
@@ -35,17 +58,53 @@ def run_source_code(source_code: str):
     for i, val in enumerate(cpu.reg):
         print(f"   R{i}: {val}")
 
+    if perfilar:
+        print("\n Lineas calientes (fuente):")
+        print(format_report(hot_lines(perfil, smap, 'source')))
+        print("\n Lineas calientes (ensamblador):")
+        print(format_report(hot_lines(perfil, smap, 'asm')))
+        if cpu.interrupciones.llamadas:
+            print("\n Servicios del anfitrion (INT):")
+            print(cpu.interrupciones.informe())
+    if flamegraph:
+        with open(flamegraph, 'w', encoding='utf-8') as f:
+            f.write("\n".join(folded_stacks(perfil, smap)) + "\n")
+        print(f"\n Pilas para flamegraph escritas en {flamegraph}")
+    if cache is not None:
+        print("\n Jerarquia de cache:")
+        print(cache.informe())
+
     print("\n Programa finalizado correctamente.")
 
 if __name__ == "__main__":
     import sys
     import os
 
-    if len(sys.argv) != 2:
-        print("Uso: python main.py <archivo.stre>")
+    args = sys.argv[1:]
+    perfilar = '--perfil' in args
+    flamegraph = None
+    if '--flamegraph' in args:
+        i = args.index('--flamegraph')
+        flamegraph = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+    cache = None
+    for a in args:
+        if a == '--cache' or a.startswith('--cache='):
+            from cache import JerarquiaCache, parse_niveles
+            spec = a.partition('=')[2]
+            try:
+                cache = JerarquiaCache(parse_niveles(spec) if spec else None)
+            except ValueError as e:
+                print(f" Error: {e}")
+                sys.exit(1)
+    args = [a for a in args if a != '--perfil' and a != '--cache' and not a.startswith('--cache=')]
+
+    if len(args) != 1 or ('--flamegraph' in sys.argv and not flamegraph):
+        print("Uso: python main.py [--perfil] [--flamegraph salida.folded] "
+              "[--cache[=L1:512:8:4:lru:4,L2:8192:8:8:lru:12]] <archivo.stre>")
         sys.exit(1)
 
-    filepath = sys.argv[1]
+    filepath = args[0]
 
     if not os.path.isfile(filepath):
         print(f" Archivo no encontrado: {filepath}")
@@ -54,4 +113,4 @@ if __name__ == "__main__":
     with open(filepath, 'r', encoding='utf-8') as f:
         source_code = f.read()
 
-    run_source_code(source_code)
+    run_source_code(source_code, perfilar, flamegraph, cache)
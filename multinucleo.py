@@ -0,0 +1,176 @@
+"""
+Simulacion multinucleo: varias CPU con registros, PC y pila (R15) propios
+compartiendo una misma memoria.
+
+Dos modos de ejecucion:
+- ``Multinucleo.ejecutar_intercalado``: planificador round-robin determinista
+  en un solo proceso (cada nucleo ejecuta ``quantum`` instrucciones por turno).
+- ``run_parallel``: un proceso por nucleo sobre ``multiprocessing.shared_memory``.
+
+Los nucleos se sincronizan con CAS/FADD y conocen su numero con CPUID.
+"""
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+from instrucciones import CPU, Memoria
+from cpu_core import detectar_codificacion
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+class MemoriaCompartida:
+    """
+    Memoria de tamano fijo (palabras de 64 bits) en un segmento de
+    ``multiprocessing.shared_memory``, accesible desde varios procesos.
+    """
+
+    def __init__(self, tam=1 << 20, nombre=None, bloqueo=None):
+        self.tam = tam
+        if nombre is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=tam * 8)
+            self.propietaria = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=nombre)
+            self.propietaria = False
+        self.palabras = self.shm.buf.cast('Q')
+        self.bloqueo = bloqueo if bloqueo is not None else mp.Lock()
+
+    @property
+    def nombre(self):
+        return self.shm.name
+
+    def escribir(self, direccion, valor):
+        self.palabras[direccion] = valor & MASK64
+
+    def leer(self, direccion):
+        return self.palabras[direccion]
+
+    def cargar(self, direccion, valores):
+        for i, v in enumerate(valores):
+            self.palabras[direccion + i] = v & MASK64
+
+    def leer_bloque(self, direccion, n):
+        return self.palabras[direccion:direccion + n].tolist()
+
+    def cerrar(self):
+        self.palabras.release()
+        self.shm.close()
+        if self.propietaria:
+            self.shm.unlink()
+
+
+def _preparar_nucleo(cpu, nucleo_id, base, cima_pila, tam_pila):
+    cpu.id = nucleo_id
+    cpu.PC = base
+    cpu.reg[15] = cima_pila - nucleo_id * tam_pila
+
+
+class Multinucleo:
+    """N nucleos sobre una memoria compartida, con planificacion intercalada."""
+
+    def __init__(self, n, mem=None, cima_pila=0x100000, tam_pila=0x1000, io=None):
+        self.mem = mem if mem is not None else Memoria()
+        self.cima_pila = cima_pila
+        self.tam_pila = tam_pila
+        self.nucleos = [CPU(io) for _ in range(n)]
+        self.contadores = [0] * n
+
+    def cargar(self, instrs, base=0x0, codificacion=None):
+        """codificacion: como en run_instructions; si es None se detecta por cabecera."""
+        codificacion, instrs = detectar_codificacion(instrs, codificacion)
+        self.mem.cargar(base, instrs)
+        for i, cpu in enumerate(self.nucleos):
+            cpu.codificacion = codificacion
+            _preparar_nucleo(cpu, i, base, self.cima_pila, self.tam_pila)
+            cpu.mem = self.mem
+
+    def ejecutar_intercalado(self, quantum=1):
+        """Ejecuta todos los nucleos por turnos hasta que todos hagan HALT."""
+        mem = self.mem
+        activos = [(i, cpu) for i, cpu in enumerate(self.nucleos) if cpu.running]
+        try:
+            while activos:
+                for i, cpu in activos:
+                    ejecutadas = 0
+                    while ejecutadas < quantum:
+                        instr = mem.leer(cpu.PC)
+                        cpu.ejecutar(instr, mem)
+                        ejecutadas += 1
+                        if not cpu.running:
+                            break
+                        cpu.PC += 1
+                    self.contadores[i] += ejecutadas
+                activos = [(i, cpu) for i, cpu in activos if cpu.running]
+        finally:
+            for cpu in self.nucleos:
+                cpu.io.flush()
+        return self.nucleos
+
+
+def run_interleaved(instrs, n, base=0x0, quantum=1, io=None, codificacion=None):
+    """Atajo: crea ``n`` nucleos, carga el programa y los ejecuta intercalados."""
+    sistema = Multinucleo(n, io=io)
+    sistema.cargar(instrs, base, codificacion)
+    sistema.ejecutar_intercalado(quantum)
+    return sistema
+
+
+def _proceso_nucleo(nombre, tam, bloqueo, nucleo_id, base, cima_pila, tam_pila, resultados,
+                    codificacion, entrada):
+    from dispositivos import DispositivosES  # evita importacion circular
+    mem = MemoriaCompartida(tam, nombre=nombre, bloqueo=bloqueo)
+    cpu = CPU(DispositivosES(entrada), codificacion)
+    cpu.mem = mem
+    _preparar_nucleo(cpu, nucleo_id, base, cima_pila, tam_pila)
+    ejecutadas = 0
+    try:
+        while cpu.running:
+            instr = mem.leer(cpu.PC)
+            cpu.ejecutar(instr, mem)
+            ejecutadas += 1
+            if cpu.running:
+                cpu.PC += 1
+    finally:
+        cpu.io.flush()
+        resultados.put((nucleo_id, list(cpu.reg), cpu.PC, ejecutadas))
+        mem.cerrar()
+
+
+def run_parallel(instrs, n, base=0x0, tam=1 << 20, tam_pila=0x1000, codificacion=None,
+                 entrada=None):
+    """
+    Ejecuta ``n`` nucleos en procesos separados sobre una memoria compartida.
+    Devuelve (resultados, mem, instrucciones_por_segundo) donde resultados es una
+    lista de diccionarios por nucleo. Quien llama debe invocar ``mem.cerrar()``.
+    codificacion: como en run_instructions; si es None se detecta por cabecera.
+    entrada: dispositivo de entrada (p. ej. EntradaLista); cada proceso recibe
+    su propia copia. Los procesos no tienen consola, asi que por defecto es
+    una entrada vacia y INPUT lanza EntradaAgotada.
+    """
+    from dispositivos import EntradaLista
+    codificacion, instrs = detectar_codificacion(instrs, codificacion)
+    if entrada is None:
+        entrada = EntradaLista([])
+    mem = MemoriaCompartida(tam)
+    mem.cargar(base, instrs)
+    resultados = mp.Queue()
+    procesos = [
+        mp.Process(target=_proceso_nucleo,
+                   args=(mem.nombre, tam, mem.bloqueo, i, base, tam, tam_pila, resultados,
+                         codificacion, entrada))
+        for i in range(n)
+    ]
+    inicio = time.perf_counter()
+    for p in procesos:
+        p.start()
+    salida = [resultados.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+    duracion = time.perf_counter() - inicio
+
+    salida.sort()
+    nucleos = [{'id': i, 'reg': reg, 'PC': pc, 'instrucciones': cnt} for i, reg, pc, cnt in salida]
+    total = sum(nc['instrucciones'] for nc in nucleos)
+    ips = total / duracion if duracion > 0 else 0.0
+    return nucleos, mem, ips
@@ -0,0 +1,166 @@
+"""
+Optimizacion de expresiones entre el parser y la generacion de codigo.
+
+Las expresiones llegan como tuplas del parser:
+    ('const', valor) | ('var', nombre) | ('binop', op, izq, der)
+
+- fold_expr: plegado de constantes, simplificaciones algebraicas
+  (x*1, x+0, x-0, x/1, x*0) y, opcionalmente, multiplicaciones por
+  potencias de dos convertidas en desplazamientos ('binop', '<<', x, k).
+- repeated_subexprs: subexpresiones repetidas dentro de una sentencia.
+- cse_key: clave canonica para reconocer a+b y b+a como la misma
+  expresion; solo se usa para buscar, nunca para emitir codigo.
+- AvailableExpressions: expresiones ya calculadas en el registro de una
+  variable por sentencias anteriores en linea recta.
+"""
+from collections import Counter
+
+# Solo se pliegan resultados que el inmediato de LOADK representa sin perdida.
+# Los negativos no se pliegan: LOADK no los lleva a complemento a dos y el
+# registro no quedaria igual que con la resta en tiempo de ejecucion.
+IMM_LIMIT = 1 << 27
+
+_COMMUTATIVE = ('+', '*')
+
+
+def _is_int_const(e):
+    return isinstance(e, tuple) and e[0] == 'const' and type(e[1]) is int
+
+
+def _fold_binop(op, a, b):
+    if op == '+':
+        return a + b
+    if op == '-':
+        return a - b
+    if op == '*':
+        return a * b
+    if op == '/' and a >= 0 and b > 0:
+        return a // b
+    return None
+
+
+def fold_expr(expr, shifts=False):
+    """
+    Devuelve una expresion equivalente simplificada.
+    shifts: reescribir x * 2^k como SHL. Los opcodes de desplazamiento
+    (0x28/0x29) empiezan por bits a cero y la codificacion variable no los
+    decodifica bien, asi que solo debe activarse al generar codigo fixed64.
+
+    Solo se mueven constantes a la derecha; dos operandos no constantes
+    conservan su orden, porque el generador evalua primero el izquierdo
+    sobre el registro destino (en 'y = y + x' invertirlos sobrescribiria y
+    antes de leerla):
+
+    >>> fold_expr(('binop', '+', ('var', 'y'), ('var', 'x')))
+    ('binop', '+', ('var', 'y'), ('var', 'x'))
+    >>> fold_expr(('binop', '*', ('const', 4), ('var', 'b')))
+    ('binop', '*', ('var', 'b'), ('const', 4))
+    >>> fold_expr(('binop', '-', ('const', 2), ('const', 5)))
+    ('binop', '-', ('const', 2), ('const', 5))
+    """
+    if not (isinstance(expr, tuple) and expr[0] == 'binop'):
+        return expr
+    op = expr[1]
+    left, right = fold_expr(expr[2], shifts), fold_expr(expr[3], shifts)
+
+    if _is_int_const(left) and _is_int_const(right):
+        val = _fold_binop(op, left[1], right[1])
+        if val is not None and 0 <= val < IMM_LIMIT:
+            return ('const', val)
+
+    # Constante a la derecha en operaciones conmutativas (variantes con
+    # inmediato); el orden del resto lo resuelve cse_key al buscar
+    if op in _COMMUTATIVE and _is_int_const(left) and not _is_int_const(right):
+        left, right = right, left
+
+    if _is_int_const(right):
+        k = right[1]
+        if k == 0 and op in ('+', '-'):
+            return left
+        if k == 1 and op in ('*', '/'):
+            return left
+        if k == 0 and op == '*':
+            return ('const', 0)
+        if shifts and op == '*' and k > 1 and k & (k - 1) == 0:
+            return ('binop', '<<', left, ('const', k.bit_length() - 1))
+    return ('binop', op, left, right)
+
+
+def cse_key(expr):
+    """
+    Clave de una expresion para el CSE: operandos de + y * ordenados, de modo
+    que a+b y b+a son la misma entrada de cache.
+    """
+    if not (isinstance(expr, tuple) and expr[0] == 'binop'):
+        return expr
+    left, right = cse_key(expr[2]), cse_key(expr[3])
+    if expr[1] in _COMMUTATIVE and repr(right) < repr(left):
+        left, right = right, left
+    return ('binop', expr[1], left, right)
+
+
+def _binops_postorder(expr, out):
+    if isinstance(expr, tuple) and expr[0] == 'binop':
+        _binops_postorder(expr[2], out)
+        _binops_postorder(expr[3], out)
+        out.append(expr)
+    return out
+
+
+def repeated_subexprs(expr):
+    """
+    Subexpresiones (binop) que aparecen mas de una vez, comparadas por
+    cse_key, las internas primero.
+    """
+    nodes = _binops_postorder(expr, [])
+    keys = [cse_key(n) for n in nodes]
+    counts = Counter(keys)
+    seen = set()
+    result = []
+    for node, key in zip(nodes, keys):
+        if counts[key] > 1 and key not in seen:
+            seen.add(key)
+            result.append(node)
+    return result
+
+
+def expr_vars(expr):
+    """Variables leidas por una expresion."""
+    if not isinstance(expr, tuple):
+        return set()
+    if expr[0] == 'var':
+        return {expr[1]}
+    if expr[0] == 'binop':
+        return expr_vars(expr[2]) | expr_vars(expr[3])
+    if expr[0] == 'call':
+        return set().union(*(expr_vars(a) for a in expr[2]))
+    return set()
+
+
+class AvailableExpressions:
+    """
+    Expresiones disponibles entre sentencias consecutivas: cada entrada
+    indica que variable contiene ya el valor de una expresion.
+    """
+
+    def __init__(self):
+        self.table = {}  # cse_key(expresion) -> variable que la contiene
+
+    def lookup(self, expr):
+        return self.table.get(cse_key(expr))
+
+    def items(self):
+        return self.table.items()
+
+    def assign(self, var, expr):
+        """Registra 'var = expr' invalidando lo que dependia de var."""
+        self.invalidate(var)
+        if isinstance(expr, tuple) and expr[0] == 'binop' and var not in expr_vars(expr):
+            self.table[cse_key(expr)] = var
+
+    def invalidate(self, var):
+        self.table = {e: v for e, v in self.table.items()
+                      if v != var and var not in expr_vars(e)}
+
+    def clear(self):
+        self.table.clear()
@@ -1,12 +1,32 @@
 import ply.yacc as yacc
 from lexer_1 import tokens
-from bigraph import Bigraph, Node
+from bigraph import Bigraph, Node
+from optimizer import fold_expr, repeated_subexprs, cse_key, AvailableExpressions
+from sourcemap import tag_lines
+from servicios import REG_ARG, REG_VAL, SERVICIO_PROCERS, SERVICIO_COLECTAVGB
 
 # Utilidades para registros
+# Registros fuera del asignador: R13/R14 son el convenio de llamada de los
+# servicios del anfitrion (ver _compile_host_call), que los sobrescribe en
+# cada INT, y R15 es el puntero de pila de PUSH/CALL/INT
+NUM_REGS = 16
+SP_REG = 15
+RESERVED_REGS = (REG_VAL, REG_ARG, SP_REG)
+
+def _physical_reg(n: int) -> int:
+    """Registro del n-esimo valor asignado, saltando los reservados."""
+    for r in sorted(RESERVED_REGS):
+        if n >= r:
+            n += 1
+    if n >= NUM_REGS:
+        raise ValueError(f"sin registros disponibles: solo hay {NUM_REGS - len(RESERVED_REGS)} "
+                         f"para variables y temporales")
+    return n
+
 def _get_reg(var: str) -> int:
     """Obtener el registro asociado a una variable, crendolo si es nuevo."""
     if var not in symbol_table:
-        symbol_table[var] = len(symbol_table)
+        symbol_table[var] = _physical_reg(len(symbol_table))
     return symbol_table[var]
 
 temp_count = 0
@@ -14,12 +34,18 @@ temp_count = 0
 def _alloc_temp() -> int:
     """Asignar un registro temporal para expresiones."""
     global temp_count
-    reg = len(symbol_table) + temp_count
+    reg = _physical_reg(len(symbol_table) + temp_count)
     temp_count += 1
     return reg
 
-def _compile_expr(expr, target_reg: int) -> list[str]:
-    """Compilar una expresin recursivamente a instrucciones."""
+def _compile_expr(expr, target_reg: int, cache=None) -> list[str]:
+    """
+    Compilar una expresin recursivamente a instrucciones.
+    cache: cse_key de expresiones ya calculadas -> registro que las contiene.
+    """
+    if cache and isinstance(expr, tuple) and cse_key(expr) in cache:
+        src = cache[cse_key(expr)]
+        return [f"MOV R{target_reg}, R{src}"] if src != target_reg else []
     if isinstance(expr, tuple):
         kind = expr[0]
         if kind == 'var':
@@ -32,27 +58,250 @@ def _compile_expr(expr, target_reg: int) -> list[str]:
         if kind == 'binop':
             op = expr[1]
             left, right = expr[2], expr[3]
-            code = _compile_expr(left, target_reg)
+            code = _compile_expr(left, target_reg, cache)
+            if op == '<<':
+                # Multiplicacion por potencia de dos (ver optimizer.fold_expr)
+                code.append(f"SHL R{target_reg}, R{target_reg}, {right[1]}")
+                return code
             # Operando derecho
-            if isinstance(right, tuple) and right[0] == 'const':
+            if cache and cse_key(right) in cache:
+                m = {'+': 'ADD', '-': 'SUB', '*': 'MUL', '/': 'DIV'}
+                code.append(f"{m[op]} R{target_reg}, R{cache[cse_key(right)]}")
+            elif isinstance(right, tuple) and right[0] == 'const':
                 m = {'+': 'ADDI', '-': 'SUBI', '*': 'MULI', '/': 'DIVI'}
                 if op not in m:
                     raise NotImplementedError(f"Operacin no soportada: {op}")
                 code.append(f"{m[op]} R{target_reg}, {right[1]}")
             else:
                 tmp = _alloc_temp()
-                code += _compile_expr(right, tmp)
+                code += _compile_expr(right, tmp, cache)
                 m = {'+': 'ADD', '-': 'SUB', '*': 'MUL', '/': 'DIV'}
                 if op not in m:
                     raise NotImplementedError(f"Operacin no soportada: {op}")
                 code.append(f"{m[op]} R{target_reg}, R{tmp}")
             return code
+        if kind == 'call':
+            return _compile_call(expr, target_reg)
     # Fallback: cargar literal
     return [f"LOADK R{target_reg}, {expr}"]
+
+# Colecciones (colect, mtix)
+# Se guardan en memoria a partir de VECTOR_BASE; el registro de la variable
+# contiene la direccion del primer elemento. Delante va una cabecera con la
+# longitud (colect: addr-1) o con filas y columnas (mtix: addr-2, addr-1),
+# que usa MMUL. La aritmetica entre colecciones se traduce a una sola
+# instruccion vectorial (VADD/VSUB/VMUL/MMUL) por operacion.
+VECTOR_BASE = 0x4000
+
+def _literal_values(expr) -> list[int]:
+    vals = []
+    for item in expr[1]:
+        item = fold_expr(item)
+        if not (isinstance(item, tuple) and item[0] == 'const' and type(item[1]) is int):
+            raise ValueError(f"Los elementos de una coleccion deben ser enteros constantes: {item}")
+        vals.append(item[1])
+    return vals
+
+def _shape(expr):
+    """Forma de una expresion: None (escalar), ('colect', n) o ('mtix', filas, cols)."""
+    if not isinstance(expr, tuple):
+        return None
+    kind = expr[0]
+    if kind == 'var':
+        entry = vector_table.get(expr[1])
+        return entry['shape'] if entry else None
+    if kind == 'vec':
+        rows = expr[1]
+        if rows and all(isinstance(r, tuple) and r[0] == 'vec' for r in rows):
+            cols = {len(r[1]) for r in rows}
+            if len(cols) != 1:
+                raise ValueError("Las filas de una mtix deben tener la misma longitud")
+            return ('mtix', len(rows), cols.pop())
+        return ('colect', len(rows))
+    if kind == 'binop':
+        op, left, right = expr[1], _shape(expr[2]), _shape(expr[3])
+        if left is None and right is None:
+            return None
+        if left is None or right is None or left[0] != right[0]:
+            raise ValueError(f"Operacion '{op}' entre tipos incompatibles: {left} y {right}")
+        if op == '*' and left[0] == 'mtix':
+            if left[2] != right[1]:
+                raise ValueError(f"Dimensiones incompatibles en mtix: {left[1:]} x {right[1:]}")
+            return ('mtix', left[1], right[2])
+        if op not in ('+', '-', '*'):
+            raise NotImplementedError(f"Operacion no soportada entre colecciones: {op}")
+        if left != right:
+            raise ValueError(f"Colecciones de distinto tamano: {left[1:]} y {right[1:]}")
+        return left
+    return None
+
+def _count(shape) -> int:
+    return shape[1] if shape[0] == 'colect' else shape[1] * shape[2]
+
+def _alloc_vector(shape, values=None):
+    """Reserva una coleccion con su cabecera; devuelve (direccion, lineas de datos)."""
+    global vector_next
+    header = [shape[1]] if shape[0] == 'colect' else [shape[1], shape[2]]
+    addr = vector_next + len(header)
+    n = _count(shape)
+    lines = [f".org {vector_next:#x}", ".word " + ", ".join(str(v) for v in header + (values or []))]
+    if not values:
+        lines.append(f".space {n}")
+    vector_next = addr + n
+    return addr, lines
+
+def _alloc_literal(expr):
+    """Reserva una coleccion inicializada con los valores de un literal."""
+    shape = _shape(expr)
+    if shape[0] == 'mtix':
+        vals = [v for row in expr[1] for v in _literal_values(row)]
+    else:
+        vals = _literal_values(expr)
+    return _alloc_vector(shape, vals)
+
+def _vector_operand(expr):
+    """Deja la direccion de una coleccion en un registro; devuelve (codigo, registro)."""
+    if expr[0] == 'var':
+        return [], _get_reg(expr[1])
+    reg = _alloc_temp()
+    if expr[0] == 'vec':
+        addr, code = _alloc_literal(expr)
+        return code + [f"LOADK R{reg}, {addr}"], reg
+    addr, code = _alloc_vector(_shape(expr))
+    code.append(f"LOADK R{reg}, {addr}")
+    return code + _compile_vector(expr, reg), reg
+
+def _compile_vector(expr, target_reg: int) -> list[str]:
+    """Calcula una expresion de colecciones en la coleccion apuntada por target_reg."""
+    shape = _shape(expr)
+    if expr[0] == 'binop':
+        op = expr[1]
+        code, ra = _vector_operand(expr[2])
+        more, rb = _vector_operand(expr[3])
+        code += more
+        if op == '*' and shape[0] == 'mtix':
+            return code + [f"MMUL R{target_reg}, R{ra}, R{rb}"]
+        rn = _alloc_temp()
+        m = {'+': 'VADD', '-': 'VSUB', '*': 'VMUL'}
+        return code + [f"LOADK R{rn}, {_count(shape)}",
+                       f"{m[op]} R{target_reg}, R{ra}, R{rb}, R{rn}"]
+    code, src = _vector_operand(expr)
+    if src == target_reg:
+        return code
+    rn = _alloc_temp()
+    return code + [f"LOADK R{rn}, {_count(shape)}", f"VMOV R{target_reg}, R{src}, R{rn}"]
+
+def _compile_vector_assignment(var: str, expr) -> list[str]:
+    entry = vector_table.setdefault(var, {'tipo': None, 'shape': None})
+    shape = _shape(expr)
+    if shape is None:
+        raise ValueError(f"'{var}' es una coleccion y no admite un valor escalar")
+    if entry['tipo'] and entry['tipo'] != shape[0]:
+        raise ValueError(f"'{var}' es {entry['tipo']} y se le asigna {shape[0]}")
+    reg_id = _get_reg(var)
+    code = []
+    if entry['shape'] is None:
+        entry['tipo'], entry['shape'] = shape[0], shape
+        if expr[0] == 'vec':
+            # Primera asignacion de un literal: los datos iniciales van directamente
+            addr, code = _alloc_literal(expr)
+            return code + [f"LOADK R{reg_id}, {addr}"]
+        addr, code = _alloc_vector(shape)
+        code.append(f"LOADK R{reg_id}, {addr}")
+    elif entry['shape'] != shape:
+        raise ValueError(f"'{var}' tiene forma {entry['shape'][1:]} y se le asigna {shape[1:]}")
+    return code + _compile_vector(expr, reg_id)
+
+# Funciones integradas resueltas por servicios del anfitrion (INT n)
+HOST_SERVICES = {'procers': SERVICIO_PROCERS, 'colectavgB': SERVICIO_COLECTAVGB}
+
+def _compile_host_call(name: str, arg, target_reg: int) -> list[str]:
+    """
+    Llamada a un servicio del anfitrion: direccion en R14, longitud en R13,
+    resultado en R13 (ver servicios.py). Con un escalar el resultado es
+    inmediato y no hace falta llamar.
+    """
+    shape = _shape(arg)
+    if shape is None:
+        if name == 'procers':
+            return [f"LOADK R{target_reg}, 1"]
+        return _compile_expr(arg, target_reg)
+    code, ra = _vector_operand(arg)
+    code += [f"MOV R{REG_ARG}, R{ra}",
+             f"LOADK R{REG_VAL}, {_count(shape)}",
+             f"INT {HOST_SERVICES[name]:#x}"]
+    if target_reg != REG_VAL:
+        code.append(f"MOV R{target_reg}, R{REG_VAL}")
+    return code
+
+def _compile_call(expr, target_reg: int) -> list[str]:
+    """
+    Funciones que devuelven un escalar: suma(v), producto(a, b) y las
+    integradas procers(v) / colectavgB(v).
+    """
+    name, args = expr[1], expr[2]
+    if name in HOST_SERVICES:
+        return _compile_host_call(name, args[0], target_reg)
+    shapes = [_shape(a) for a in args]
+    if name == 'suma' and len(args) == 1 and shapes[0]:
+        code, ra = _vector_operand(args[0])
+        rn = _alloc_temp()
+        return code + [f"LOADK R{rn}, {_count(shapes[0])}", f"VSUM R{target_reg}, R{ra}, R{rn}"]
+    if name == 'producto' and len(args) == 2 and shapes[0] and shapes[0] == shapes[1]:
+        code, ra = _vector_operand(args[0])
+        more, rb = _vector_operand(args[1])
+        rn = _alloc_temp()
+        return code + more + [f"LOADK R{rn}, {_count(shapes[0])}",
+                              f"VDOT R{target_reg}, R{ra}, R{rb}, R{rn}"]
+    raise NotImplementedError(f"Funcion no soportada: {name}/{len(args)}")
+
+def _compile_assignment(var: str, expr) -> list[str]:
+    """
+    Optimizar la expresin (plegado, simplificaciones, CSE) y compilar
+    'var = expr' sobre el registro de la variable.
+    """
+    if var in vector_table or _shape(expr) is not None:
+        # Las colecciones no pasan por el plegado (MMUL no es conmutativa)
+        available.invalidate(var)
+        return _compile_vector_assignment(var, expr)
+    reg_id = _get_reg(var)
+    expr = fold_expr(expr, shifts=use_shifts)
+    # Valores disponibles de sentencias anteriores, salvo los que estn en el
+    # propio registro destino (se sobrescribe durante la evaluacin)
+    cache = {e: _get_reg(v) for e, v in available.items() if v != var}
+    code = []
+    for sub in repeated_subexprs(expr):
+        if cse_key(sub) in cache or cse_key(sub) == cse_key(expr):
+            continue
+        tmp = _alloc_temp()
+        code += _compile_expr(sub, tmp, cache)
+        cache[cse_key(sub)] = tmp
+    code += _compile_expr(expr, reg_id, cache)
+    available.assign(var, expr)
+    return code
 
 # Globales
 global_bigraph = Bigraph()
 symbol_table = {}
+vector_table = {}  # variable -> {'tipo': 'colect'|'mtix', 'shape': forma o None}
+vector_next = VECTOR_BASE
+available = AvailableExpressions()
+# Reducir x * 2^k a SHL (solo valido si el binario se ensambla en fixed64);
+# compile_high_level_code lo activa segun la codificacion destino
+use_shifts = False
+
+def reset_state():
+    """Olvidar el programa anterior (bigrafo, registros, expresiones disponibles)."""
+    global temp_count, vector_next
+    temp_count = 0
+    vector_next = VECTOR_BASE
+    symbol_table.clear()
+    vector_table.clear()
+    available.clear()
+    global_bigraph.nodes.clear()
+    global_bigraph.links.clear()
+    global_bigraph.instructions.clear()
+    global_bigraph.instruction_lines.clear()
 
 precedence = (
     ('left', 'PLUS', 'MINUS'),
@@ -64,7 +313,7 @@ def p_program(p):
     print(" Programa completo.")
     for instr in p[1]:
         if instr and isinstance(instr, str) and instr.strip() and not instr.strip().startswith(";"):
-            global_bigraph.add_instruction(instr.strip())
+            global_bigraph.add_instruction(instr.strip(), getattr(instr, 'src_line', None))
     p[0] = global_bigraph
 
 def p_instruction_list(p):
@@ -92,14 +341,17 @@ def p_declaration(p):
     var = p[3]
     reg_id = _get_reg(var)
 
-    node = Node(f"decl_{var}")
+    node = Node(f"decl_{var}", lineno=p.lineno(1))
     global_bigraph.add_node(node)
+    if p[2] in ('colect', 'mtix'):
+        vector_table[var] = {'tipo': p[2], 'shape': None}
 
     if len(p) == 7:
         print(f" Declaracin con valor: {var} = {p[5]}")
-        p[0] = _compile_expr(p[5], reg_id)
+        p[0] = tag_lines(_compile_assignment(var, p[5]), p.lineno(1))
     else:
         print(f" Declaracin sin valor: {var}")
+        available.invalidate(var)
         p[0] = []
 
 def p_tipo(p):
@@ -118,10 +370,9 @@ def p_assignment(p):
     var = p[1]
     val = p[3]
     print(f" Asignacin: {var} = {val}")
-    reg_id = _get_reg(var)
-    node = Node(f"assign_{var}")
+    node = Node(f"assign_{var}", lineno=p.lineno(1))
     global_bigraph.add_node(node)
-    p[0] = _compile_expr(val, reg_id)
+    p[0] = tag_lines(_compile_assignment(var, val), p.lineno(1))
 
 def p_expression_binop(p):
     '''expression : expression PLUS expression
@@ -129,6 +380,24 @@ def p_expression_binop(p):
                   | expression TIMES expression
                   | expression DIVIDE expression'''
     p[0] = ('binop', p[2], p[1], p[3])
+
+def p_expression_collection(p):
+    'expression : LBRACKET expression_list RBRACKET'
+    p[0] = ('vec', tuple(p[2]))
+
+def p_expression_call(p):
+    'expression : IDENTIFIER LPAREN expression_list RPAREN'
+    p[0] = ('call', p[1], tuple(p[3]))
+
+def p_expression_builtin(p):
+    '''expression : FUNC_PROCERS LPAREN expression RPAREN
+                  | FUNC_COLECTAVGB LPAREN expression RPAREN'''
+    p[0] = ('call', p[1], (p[3],))
+
+def p_expression_list(p):
+    '''expression_list : expression
+                       | expression COMMA expression_list'''
+    p[0] = [p[1]] if len(p) == 2 else [p[1]] + p[3]
 
 def p_expression_group(p):
     'expression : LPAREN expression RPAREN'
@@ -150,17 +419,22 @@ def p_expression_value(p):
 def p_control_flow(p):
     'control_flow : KEYWORD_WHILE_STRE LPAREN expression RPAREN LBRACE instruction_list RBRACE'
     print(" Estructura de control reconocida.")
-    node = Node("while")
+    # Las sentencias del cuerpo no son codigo en linea recta
+    available.clear()
+    node = Node("while", lineno=p.lineno(1))
     global_bigraph.add_node(node)
     p[0] = []
 
 def p_racha_process(p):
     '''racha_process : FUNC_PROCERS LPAREN IDENTIFIER RPAREN SEMICOLON
                      | FUNC_COLECTAVGB LPAREN IDENTIFIER RPAREN SEMICOLON'''
+    global temp_count
+    temp_count = 0
     print(f" Proceso de racha: {p[1]}")
-    node = Node(p[1])
+    node = Node(p[1], lineno=p.lineno(1))
     global_bigraph.add_node(node)
-    p[0] = [f"; llamada a {p[1]} con {p[3]}"]
+    code = [f"; llamada a {p[1]} con {p[3]}"] + _compile_host_call(p[1], ('var', p[3]), REG_VAL)
+    p[0] = tag_lines(code, p.lineno(1))
 
 def p_function_call(p):
     'function_call : IDENTIFIER LPAREN RPAREN SEMICOLON'
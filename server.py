@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Servidor local de compilacion y ejecucion.
+
+Mantiene un grupo de procesos trabajadores con el lexer, el parser (tablas
+PLY ya construidas) y el resto de modulos cargados, de modo que cada
+peticion solo paga el trabajo del propio programa.
+
+Protocolo: HTTP/JSON, en localhost o en un socket Unix.
+
+    POST /run   {"kind": "source" | "asm" | "binary",
+                 "code": "<texto>"  (binary: lista de enteros o texto),
+                 "encoding": "variable" | "fixed64"   (opcional),
+                 "input": [enteros]                   (opcional),
+                 "max_steps": 1000000                 (opcional, hasta MAX_STEPS),
+                 "timeout": 10.0                      (opcional, segundos, hasta MAX_TIMEOUT),
+                 "log": false                         (opcional, devuelve stdout)}
+
+    GET /health -> {"ok": true, "workers": N}
+
+La respuesta incluye registros, FLAGS, PC, valores emitidos por OUTPUT,
+el ensamblador generado (kind=source) y el error si lo hubo.
+
+El tiempo limite se aplica dentro del trabajador (SIGALRM), de modo que un
+programa que no termina no deja el trabajador ocupado; en plataformas sin
+setitimer solo lo acota MAX_STEPS.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MAX_STEPS = 1_000_000
+DEFAULT_TIMEOUT = 10.0
+# Topes que el cliente no puede superar
+MAX_STEPS = 50_000_000
+MAX_TIMEOUT = 60.0
+# Margen para la espera en cola antes de responder 504 sin resultado
+QUEUE_GRACE = 5.0
+
+
+class TiempoAgotado(BaseException):
+    """
+    El trabajo supero el tiempo limite de la peticion. Deriva de
+    BaseException para atravesar los 'except Exception' del pipeline (por
+    ejemplo el de compile_high_level_code) y llegar hasta run_job.
+    """
+
+
+@contextlib.contextmanager
+def _plazo(segundos):
+    """Interrumpe el bloque con TiempoAgotado al cabo de 'segundos' (Unix)."""
+    if not segundos or not hasattr(signal, 'setitimer'):
+        yield
+        return
+
+    def _alarma(signum, frame):
+        raise TiempoAgotado(f"Tiempo agotado ({segundos} s)")
+
+    anterior = signal.signal(signal.SIGALRM, _alarma)
+    signal.setitimer(signal.ITIMER_REAL, segundos)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+
+def _warm_worker(mem_limit_mb=None):
+    """Inicializador de cada trabajador: importa el pipeline y aplica limites."""
+    if mem_limit_mb:
+        try:
+            import resource
+            limit = mem_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+    # Importar construye las tablas del lexer y del parser una sola vez
+    with contextlib.redirect_stdout(io.StringIO()):
+        import compiler_frontend  # noqa: F401
+        import assembler  # noqa: F401
+        import cpu_core  # noqa: F401
+
+
+def _parse_binary(code):
+    if isinstance(code, list):
+        return [int(w) for w in code]
+    return [int(tok, 0) for tok in str(code).split()]
+
+
+def _limits(payload):
+    """(max_steps, timeout) de la peticion, acotados; ValueError si no son numeros."""
+    try:
+        max_steps = int(payload.get('max_steps', DEFAULT_MAX_STEPS))
+        timeout = float(payload.get('timeout', DEFAULT_TIMEOUT))
+    except (TypeError, ValueError):
+        raise ValueError("max_steps y timeout deben ser numericos") from None
+    return min(max_steps, MAX_STEPS), min(timeout, MAX_TIMEOUT)
+
+
+def run_job(payload):
+    """Ejecuta una peticion completa en el trabajador y devuelve un dict JSON."""
+    from compiler_frontend import compile_high_level_code
+    from assembler import assemble_program
+    from cpu_core import run_instructions
+    from dispositivos import DispositivosES, EntradaLista, SalidaLista
+
+    kind = payload.get('kind', 'source')
+    code = payload.get('code', '')
+    encoding = payload.get('encoding')
+    result = {'ok': False, 'kind': kind}
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        max_steps, timeout = _limits(payload)
+        with _plazo(timeout), contextlib.redirect_stdout(log):
+            data = None
+            if kind == 'binary':
+                words = _parse_binary(code)
+            else:
+                if kind == 'source':
+                    asm_lines = compile_high_level_code(code, encoding=encoding or 'variable')
+                    if not asm_lines:
+                        raise ValueError("La compilacion no genero instrucciones")
+                    result['asm'] = asm_lines
+                elif kind == 'asm':
+                    asm_lines = code.splitlines() if isinstance(code, str) else list(code)
+                else:
+                    raise ValueError(f"Tipo de carga desconocido: {kind}")
+                words, data = assemble_program(asm_lines, encoding or 'variable', header=True)
+            salida = SalidaLista()
+            io_dev = DispositivosES(EntradaLista(payload.get('input', [])), salida)
+            cpu, _ = run_instructions(words, io=io_dev, codificacion=encoding, datos=data,
+                                      max_pasos=max_steps)
+        result.update(ok=True, registers=list(cpu.reg), flags=dict(cpu.FLAGS), pc=cpu.PC,
+                      output=salida.valores)
+    except TiempoAgotado as e:
+        result.update(error=str(e), timeout=True)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['elapsed'] = time.perf_counter() - start
+    if payload.get('log'):
+        result['log'] = log.getvalue()
+    return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "StreSimServer/1.0"
+
+    def address_string(self):
+        # En sockets Unix client_address es una cadena vacia
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'ok': True, 'workers': self.server.workers})
+        else:
+            self._send(404, {'ok': False, 'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/run':
+            self._send(404, {'ok': False, 'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send(400, {'ok': False, 'error': f"JSON invalido: {e}"})
+            return
+        if not isinstance(payload, dict):
+            self._send(400, {'ok': False, 'error': "La peticion debe ser un objeto JSON"})
+            return
+        try:
+            _, timeout = _limits(payload)
+        except ValueError as e:
+            self._send(400, {'ok': False, 'error': str(e)})
+            return
+        future = self.server.pool.submit(run_job, payload)
+        try:
+            # El propio trabajador corta al agotar el tiempo; el margen
+            # cubre la espera en cola mientras los demas estan ocupados
+            result = future.result(timeout=timeout + QUEUE_GRACE)
+        except TimeoutError:
+            future.cancel()
+            self._send(504, {'ok': False, 'error': f"Tiempo agotado ({timeout} s)"})
+            return
+        except Exception as e:
+            # Fallo del propio trabajador (p. ej. el proceso murio)
+            self._send(500, {'ok': False, 'error': f"{type(e).__name__}: {e}"})
+            return
+        self._send(504 if result.get('timeout') else 200, result)
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(host='127.0.0.1', port=8765, socket_path=None, workers=None,
+          mem_limit_mb=None, verbose=False):
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker,
+                               initargs=(mem_limit_mb,))
+    # Arrancar los trabajadores ya, no en la primera peticion
+    for f in [pool.submit(int, 0) for _ in range(workers)]:
+        f.result()
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        httpd = _UnixHTTPServer(socket_path, _Handler)
+        where = socket_path
+    else:
+        httpd = ThreadingHTTPServer((host, port), _Handler)
+        where = f"http://{host}:{port}"
+    httpd.pool, httpd.workers, httpd.verbose = pool, workers, verbose
+    print(f"Servidor escuchando en {where} con {workers} trabajadores")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        pool.shutdown(cancel_futures=True)
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="Servidor local de compilacion y ejecucion")
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--socket', help="ruta de socket Unix (en lugar de TCP)")
+    ap.add_argument('--workers', type=int, help="procesos trabajadores (por defecto, num. de CPUs)")
+    ap.add_argument('--mem-limit', type=int, help="limite de memoria por trabajador en MB")
+    ap.add_argument('-v', '--verbose', action='store_true')
+    args = ap.parse_args()
+    serve(args.host, args.port, args.socket, args.workers, args.mem_limit, args.verbose)
+    sys.exit(0)
@@ -0,0 +1,111 @@
+"""
+Tabla de vectores de interrupcion y servicios del anfitrion.
+
+``INT n`` consulta la entrada n de la tabla de la CPU:
+
+- una direccion: se apila el PC y se salta al manejador (vuelve con IRET);
+- un servicio: se ejecuta directamente en Python sobre los registros y la
+  memoria de la CPU, sin salir de la instruccion;
+- sin entrada: se salta a VECTOR_DEFECTO (0x1000), como hacia INT antes de
+  existir la tabla.
+
+Convenio de llamada de los servicios sobre colecciones (ver parser_2.py):
+R14 contiene la direccion del primer elemento y R13 el numero de elementos;
+el resultado vuelve en R13.
+"""
+import time
+from collections import defaultdict
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+VECTOR_DEFECTO = 0x1000
+
+REG_ARG = 14
+REG_VAL = 13
+
+SERVICIO_PROCERS = 0x20
+SERVICIO_COLECTAVGB = 0x21
+
+
+def _con_signo(v):
+    v &= MASK64
+    return v - (1 << 64) if v >> 63 else v
+
+
+def _resultado(cpu, valor):
+    valor &= MASK64
+    cpu.reg[REG_VAL] = valor
+    cpu.instrucciones.set_flags(valor)
+
+
+def _argumentos(cpu):
+    """Valores (con signo) de la coleccion pasada en R14/R13."""
+    vals = cpu.mem.leer_bloque(cpu.reg[REG_ARG], cpu.reg[REG_VAL])
+    return [_con_signo(v) for v in vals]
+
+
+def servicio_colectavgB(cpu):
+    """Media entera (truncada hacia cero) de la coleccion."""
+    vals = _argumentos(cpu)
+    if not vals:
+        return _resultado(cpu, 0)
+    total = sum(vals)
+    media = abs(total) // len(vals)
+    _resultado(cpu, media if total >= 0 else -media)
+
+
+def servicio_procers(cpu):
+    """Longitud de la racha creciente (estricta) mas larga de la coleccion."""
+    vals = _argumentos(cpu)
+    mejor = actual = 1 if vals else 0
+    for a, b in zip(vals, vals[1:]):
+        actual = actual + 1 if b > a else 1
+        mejor = max(mejor, actual)
+    _resultado(cpu, mejor)
+
+
+class TablaInterrupciones:
+    """Vectores de INT y estadisticas de llamadas por servicio."""
+
+    def __init__(self):
+        self.vectores = {}
+        self.llamadas = defaultdict(int)
+        self.tiempo_ns = defaultdict(int)
+
+    def registrar(self, numero, destino, nombre=None):
+        """destino: direccion del manejador o funcion servicio(cpu)."""
+        if callable(destino):
+            destino.nombre_servicio = nombre or destino.__name__
+        self.vectores[numero] = destino
+
+    def atender(self, cpu, numero):
+        destino = self.vectores.get(numero, VECTOR_DEFECTO)
+        if callable(destino):
+            t0 = time.perf_counter_ns()
+            destino(cpu)
+            self.tiempo_ns[numero] += time.perf_counter_ns() - t0
+            self.llamadas[numero] += 1
+            return
+        sp = 15
+        cpu.reg[sp] = (cpu.reg[sp] - 1) & MASK64
+        cpu.mem.escribir(cpu.reg[sp], cpu.PC)
+        cpu.PC = destino
+
+    def estadisticas(self):
+        """Lista de (numero, nombre, llamadas, tiempo_ns) de los servicios usados."""
+        return [(n, getattr(self.vectores.get(n), 'nombre_servicio', '?'),
+                 self.llamadas[n], self.tiempo_ns[n])
+                for n in sorted(self.llamadas)]
+
+    def informe(self):
+        out = [f"{'INT':>6} {'servicio':<12} {'llamadas':>9} {'tiempo(us)':>11}"]
+        for n, nombre, llamadas, ns in self.estadisticas():
+            out.append(f"{n:>#6x} {nombre:<12} {llamadas:>9} {ns / 1000:>11.1f}")
+        return "\n".join(out)
+
+
+def tabla_por_defecto():
+    """Tabla con los servicios de las funciones integradas del lenguaje."""
+    tabla = TablaInterrupciones()
+    tabla.registrar(SERVICIO_PROCERS, servicio_procers, 'procers')
+    tabla.registrar(SERVICIO_COLECTAVGB, servicio_colectavgB, 'colectavgB')
+    return tabla
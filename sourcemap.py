@@ -0,0 +1,140 @@
+"""
+Mapas de fuente y perfilado por linea.
+
+La informacion de linea fluye por el pipeline:
+
+    linea .stre  --(parser_2 / BigraphCompiler)-->  linea de ensamblador
+    linea asm    --(assemble_program)-->            palabra / PC
+
+``SourceMap`` guarda ambos saltos y ``ExecutionProfile`` acumula, por PC,
+instrucciones ejecutadas y tiempo. Con ambos se generan un informe de
+lineas calientes (ordenable) y un volcado "folded" compatible con
+flamegraph.pl / speedscope.
+"""
+from collections import defaultdict
+
+
+class AsmLine(str):
+    """Linea de ensamblador que recuerda la linea de fuente que la genero."""
+
+    def __new__(cls, text, src_line=None):
+        obj = super().__new__(cls, text)
+        obj.src_line = src_line
+        return obj
+
+
+def tag_lines(code, src_line):
+    """Marca una lista de lineas de ensamblador con su linea de fuente."""
+    return [AsmLine(line, src_line) for line in code]
+
+
+class SourceMap:
+    """Correspondencias fuente -> ensamblador -> PC de un programa."""
+
+    def __init__(self, source=None):
+        self.source_lines = source.splitlines() if source else []
+        self.asm_lines = []   # texto de cada linea de ensamblador
+        self.asm_src = []     # indice asm -> linea de fuente (1-based) o None
+        self.pc_asm = []      # indice de palabra -> indice asm
+        self.base = 0
+
+    def set_asm(self, lines, src_lines=None):
+        self.asm_lines = list(lines)
+        self.asm_src = list(src_lines) if src_lines is not None else [None] * len(self.asm_lines)
+
+    def asm_for_pc(self, pc):
+        i = pc - self.base
+        return self.pc_asm[i] if 0 <= i < len(self.pc_asm) else None
+
+    def src_for_pc(self, pc):
+        a = self.asm_for_pc(pc)
+        return self.asm_src[a] if a is not None and a < len(self.asm_src) else None
+
+    def source_text(self, line):
+        if line is not None and 0 < line <= len(self.source_lines):
+            return self.source_lines[line - 1].strip()
+        return ''
+
+
+class ExecutionProfile:
+    """Instrucciones ejecutadas y tiempo (ns) acumulados por PC."""
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.time_ns = defaultdict(int)
+
+    @property
+    def total_count(self):
+        return sum(self.counts.values())
+
+    @property
+    def total_ns(self):
+        return sum(self.time_ns.values())
+
+
+def hot_lines(profile, smap, level='source', sort='time'):
+    """
+    Agrega el perfil por linea. level: 'source', 'asm' o 'pc'.
+    sort: 'time', 'count' o 'line'. Devuelve una lista de diccionarios.
+    """
+    counts, times = defaultdict(int), defaultdict(int)
+    for pc, n in profile.counts.items():
+        if level == 'source':
+            key = smap.src_for_pc(pc)
+        elif level == 'asm':
+            key = smap.asm_for_pc(pc)
+        else:
+            key = pc
+        counts[key] += n
+        times[key] += profile.time_ns.get(pc, 0)
+
+    total_ns = profile.total_ns or 1
+    rows = []
+    for key in counts:
+        if level == 'source':
+            text = smap.source_text(key) if key is not None else '(sin linea de fuente)'
+            line = key
+        elif level == 'asm':
+            text = smap.asm_lines[key] if key is not None else '?'
+            line = key + 1 if key is not None else None
+        else:
+            a = smap.asm_for_pc(key)
+            text = smap.asm_lines[a] if a is not None else '?'
+            line = key
+        rows.append({'line': line, 'text': text, 'count': counts[key],
+                     'time_ns': times[key], 'pct': 100.0 * times[key] / total_ns})
+
+    if sort == 'count':
+        rows.sort(key=lambda r: -r['count'])
+    elif sort == 'line':
+        rows.sort(key=lambda r: (r['line'] is None, r['line'] or 0))
+    else:
+        rows.sort(key=lambda r: -r['time_ns'])
+    return rows
+
+
+def format_report(rows, limit=20):
+    """Tabla de texto con las lineas mas calientes."""
+    out = [f"{'linea':>6} {'ejecuciones':>12} {'tiempo(us)':>11} {'%':>6}  texto"]
+    for r in rows[:limit]:
+        line = '-' if r['line'] is None else r['line']
+        out.append(f"{line:>6} {r['count']:>12} {r['time_ns'] / 1000:>11.1f} {r['pct']:>6.1f}  {r['text']}")
+    return "\n".join(out)
+
+
+def folded_stacks(profile, smap, metric='time', root='programa'):
+    """
+    Formato "folded" de flamegraph: una linea por pila
+    'programa;L<n> <fuente>;<asm> <valor>'. metric: 'time' (ns) o 'count'.
+    """
+    values = profile.time_ns if metric == 'time' else profile.counts
+    stacks = defaultdict(int)
+    for pc, val in values.items():
+        a = smap.asm_for_pc(pc)
+        src = smap.asm_src[a] if a is not None and a < len(smap.asm_src) else None
+        src_frame = f"L{src} {smap.source_text(src)}" if src is not None else "(runtime)"
+        asm_frame = smap.asm_lines[a] if a is not None else f"pc={pc:#x}"
+        # ';' separa marcos en el formato folded
+        frames = [root, src_frame.replace(';', ','), asm_frame.replace(';', ',')]
+        stacks[';'.join(frames)] += val
+    return [f"{stack} {val}" for stack, val in sorted(stacks.items())]